@@ -1,27 +1,55 @@
-import { useEffect, useState } from "react";
+import { useEffect, useState, type FormEvent } from "react";
 import { Link } from "react-router-dom";
 import api from "../api/client";
-import type { Project } from "../types";
+import type { Project, SearchHit } from "../types";
+
+// Snippets mark matches with <mark></mark>; split on them so the text itself is rendered escaped.
+const renderSnippet = (snippet: string) =>
+  snippet
+    .split(/<mark>(.*?)<\/mark>/g)
+    .map((part, index) => (index % 2 ? <mark key={index}>{part}</mark> : part));
 
 export function DashboardPage() {
   const [projects, setProjects] = useState<Project[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [query, setQuery] = useState("");
+  const [hits, setHits] = useState<SearchHit[] | null>(null);
+
+  const loadPage = async (cursor: string | null) => {
+    setLoading(true);
+    try {
+      const { data, headers } = await api.get<Project[]>("/projects/", {
+        params: cursor ? { cursor } : undefined,
+      });
+      setProjects((current) => (cursor ? [...current, ...data] : data));
+      setNextCursor(headers["x-next-cursor"] || null);
+    } catch (err: any) {
+      setError(err.response?.data?.detail || "Failed to load projects");
+    } finally {
+      setLoading(false);
+    }
+  };
 
   useEffect(() => {
-    const load = async () => {
-      try {
-        const { data } = await api.get<Project[]>("/projects/");
-        setProjects(data);
-      } catch (err: any) {
-        setError(err.response?.data?.detail || "Failed to load projects");
-      } finally {
-        setLoading(false);
-      }
-    };
-    load();
+    loadPage(null);
   }, []);
 
+  const handleSearch = async (event: FormEvent) => {
+    event.preventDefault();
+    if (!query.trim()) {
+      setHits(null);
+      return;
+    }
+    try {
+      const { data } = await api.get<SearchHit[]>("/search", { params: { q: query.trim() } });
+      setHits(data);
+    } catch (err: any) {
+      setError(err.response?.data?.detail || "Search failed");
+    }
+  };
+
   return (
     <div className="page">
       <div className="page-header">
@@ -33,7 +61,31 @@ export function DashboardPage() {
           New project
         </Link>
       </div>
-      {loading && <p>Loading...</p>}
+      <form onSubmit={handleSearch}>
+        <input
+          type="search"
+          placeholder="Search projects and sections"
+          value={query}
+          onChange={(event) => setQuery(event.target.value)}
+        />
+      </form>
+      {hits && (
+        <div className="card-grid">
+          {hits.length === 0 && <p>No matches.</p>}
+          {hits.map((hit) => (
+            <Link
+              key={`${hit.kind}-${hit.section_id ?? hit.project_id}`}
+              to={`/projects/${hit.project_id}`}
+              className="card"
+            >
+              <h3>{hit.title}</h3>
+              {hit.kind === "section" && <p className="tag">{hit.project_title}</p>}
+              <p>{renderSnippet(hit.snippet)}</p>
+            </Link>
+          ))}
+        </div>
+      )}
+      {loading && projects.length === 0 && <p>Loading...</p>}
       {error && <div className="error">{error}</div>}
       {!loading && projects.length === 0 && <p>No projects yet.</p>}
       <div className="card-grid">
@@ -48,6 +100,11 @@ export function DashboardPage() {
           </Link>
         ))}
       </div>
+      {nextCursor && (
+        <button onClick={() => loadPage(nextCursor)} disabled={loading}>
+          {loading ? "Loading..." : "Load more"}
+        </button>
+      )}
     </div>
   );
 }
@@ -1,10 +1,14 @@
 import { useEffect, useState } from "react";
 import { useParams } from "react-router-dom";
 import api from "../api/client";
-import type { ProjectDetail, Section } from "../types";
+import type { ExportArtifact, Job, ProjectChanges, ProjectDetail, Section } from "../types";
 
 type InputMaps = Record<number, string>;
 
+const JOB_POLL_MS = 1500;
+
+const wait = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
 export function ProjectDetailPage() {
   const { id } = useParams();
   const projectId = Number(id);
@@ -28,6 +32,26 @@ export function ProjectDetailPage() {
     }
   };
 
+  // Pulls only the sections changed since the version we hold; falls back to a full load on conflict.
+  const syncProject = async (current: ProjectDetail) => {
+    try {
+      const { data } = await api.get<ProjectChanges>(`/projects/${projectId}/changes`, {
+        params: { since: current.version },
+      });
+      const { since, sections: changed, ...fields } = data;
+      const byId = new Map(changed.map((section) => [section.id, section]));
+      const next = {
+        ...fields,
+        sections: current.sections.map((section) => byId.get(section.id) ?? section),
+      };
+      setProject(next);
+      return next;
+    } catch {
+      await loadProject();
+      return null;
+    }
+  };
+
   useEffect(() => {
     if (!Number.isNaN(projectId)) {
       loadProject();
@@ -37,8 +61,21 @@ export function ProjectDetailPage() {
   const handleGenerate = async (regenerate: boolean) => {
     setGlobalBusy(true);
     try {
-      const { data } = await api.post<ProjectDetail>(`/projects/${projectId}/generate`, { regenerate });
-      setProject(data);
+      let { data: job } = await api.post<Job>(`/projects/${projectId}/generate`, { regenerate });
+      let current = project && (await syncProject(project));
+      while (job.status === "queued" || job.status === "running") {
+        await wait(JOB_POLL_MS);
+        ({ data: job } = await api.get<Job>(`/jobs/${job.id}`));
+        current = current && (await syncProject(current));
+      }
+      if (job.status === "failed") {
+        setError(job.error || "Generation failed");
+      }
+      if (current) {
+        await syncProject(current);
+      } else {
+        await loadProject();
+      }
     } catch (err: any) {
       setError(err.response?.data?.detail || "Generation failed");
     } finally {
@@ -116,10 +153,18 @@ export function ProjectDetailPage() {
     if (!project) return;
     setGlobalBusy(true);
     try {
-      const response = await api.get(`/export/${project.id}`, {
-        params: { format },
-        responseType: "blob",
-      });
+      const response = await api
+        .get(`/export/${project.id}`, { params: { format }, responseType: "blob" })
+        .catch(async (err) => {
+          if (err.response?.status !== 413) throw err;
+          let { data: artifact } = await api.post<ExportArtifact>(`/export/${project.id}`, null, { params: { format } });
+          while (artifact.status === "queued" || artifact.status === "running") {
+            await wait(JOB_POLL_MS);
+            ({ data: artifact } = await api.get<ExportArtifact>(`/export/artifacts/${artifact.id}/status`));
+          }
+          if (artifact.status === "failed") throw new Error(artifact.error || "Export failed");
+          return api.get(`/export/artifacts/${artifact.id}`, { responseType: "blob" });
+        });
       const url = window.URL.createObjectURL(new Blob([response.data]));
       const link = document.createElement("a");
       link.href = url;
@@ -128,7 +173,7 @@ export function ProjectDetailPage() {
       link.click();
       link.parentNode?.removeChild(link);
     } catch (err: any) {
-      setError(err.response?.data?.detail || "Export failed");
+      setError(err.response?.data?.detail || err.message || "Export failed");
     } finally {
       setGlobalBusy(false);
     }
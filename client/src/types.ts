@@ -11,6 +11,7 @@ export type Section = {
   content: string;
   feedback?: FeedbackChoice | null;
   last_comment?: string | null;
+  version: number;
   created_at: string;
   updated_at: string;
 };
@@ -21,6 +22,7 @@ export type Project = {
   topic: string;
   doc_type: DocType;
   status: ProjectStatus;
+  version: number;
   created_at: string;
   updated_at: string;
 };
@@ -29,3 +31,61 @@ export type ProjectDetail = Project & {
   sections: Section[];
 };
 
+export type SectionSummary = Omit<Section, "content"> & {
+  preview: string;
+  content_length: number;
+  content_hash: string;
+};
+
+export type ProjectSummary = Project & {
+  sections: SectionSummary[];
+};
+
+export type ProjectChanges = Project & {
+  since: number;
+  sections: Section[];
+};
+
+
+export type JobStatus = "queued" | "running" | "succeeded" | "failed";
+
+export type JobSectionProgress = {
+  section_id: number;
+  status: string;
+};
+
+export type Job = {
+  id: number;
+  project_id: number;
+  kind: string;
+  status: JobStatus;
+  total_sections: number;
+  completed_sections: number;
+  attempts: number;
+  error?: string | null;
+  created_at: string;
+  started_at?: string | null;
+  finished_at?: string | null;
+  sections: JobSectionProgress[];
+};
+
+export type ExportArtifact = {
+  id: number;
+  project_id: number;
+  format: "docx" | "pptx";
+  status: JobStatus;
+  size?: number | null;
+  error?: string | null;
+  created_at: string;
+  finished_at?: string | null;
+};
+
+export type SearchHit = {
+  kind: "project" | "section";
+  project_id: number;
+  project_title: string;
+  section_id: number | null;
+  title: string;
+  snippet: string;
+  score: number;
+};
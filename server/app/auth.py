@@ -1,28 +1,87 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlmodel import Session, select
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .config import get_settings
-from .database import get_session
+from .database import get_async_session
 from .models import User
 from .schemas import TokenData
+from .services.metrics import metrics
+from .services.passwords import PasswordHasher
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 settings = get_settings()
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.bcrypt_rounds)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+class PrincipalCache:
+    """LRU of verified bearer tokens to user snapshots.
 
+    Entries live until the token's `exp` or `ttl` seconds, whichever comes first, and are dropped
+    as soon as the user row changes in this process.
+    """
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[User, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[User]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, token: str, user: User, token_exp: float) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = min(token_exp, time.time() + self.ttl)
+        snapshot = User(**user.model_dump())
+        with self._lock:
+            self._entries[self._key(token)] = (snapshot, expires_at)
+            self._entries.move_to_end(self._key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for key in [key for key, (user, _) in self._entries.items() if user.id == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(settings.auth_cache_size, settings.auth_cache_ttl)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_principal(_mapper, _connection, target: User) -> None:
+    principal_cache.invalidate_user(target.id)
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
@@ -33,15 +92,21 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     return encoded_jwt
 
 
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    cached = principal_cache.get(token)
+    if cached is not None:
+        metrics.incr("auth.cache.hit")
+        return cached
+    metrics.incr("auth.cache.miss")
+
     try:
         payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
         user_id_str: str | None = payload.get("sub")
@@ -52,8 +117,9 @@ def get_current_user(
     except (JWTError, ValueError) as exc:
         raise credentials_exception from exc
 
-    user = session.get(User, token_data.user_id)
+    user = await session.get(User, token_data.user_id)
     if user is None:
         raise credentials_exception
+    principal_cache.put(token, user, payload.get("exp", time.time()))
     return user
 
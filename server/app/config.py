@@ -7,12 +7,86 @@ class Settings:
     database_url: str = os.getenv(
         "DATABASE_URL", "sqlite:///./ocean_ai.db"
     )
+    async_database_url: str | None = os.getenv("ASYNC_DATABASE_URL")
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    sqlite_tuning: bool = os.getenv("SQLITE_TUNING", "true").lower() in ("1", "true", "yes")
+    sqlite_journal_mode: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    sqlite_synchronous: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    sqlite_cache_size: int = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+    sqlite_mmap_size: int = int(os.getenv("SQLITE_MMAP_SIZE", "268435456"))
+    write_queue_enabled: bool = os.getenv("WRITE_QUEUE_ENABLED", "true").lower() in ("1", "true", "yes")
+    write_queue_max_batch: int = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64"))
+    write_queue_max_delay_ms: float = float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", "2"))
     jwt_secret_key: str = os.getenv("JWT_SECRET_KEY", "change-me")
     jwt_algorithm: str = os.getenv("JWT_ALGORITHM", "HS256")
     access_token_expire_minutes: int = int(
         os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
     )
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    login_concurrency_per_ip: int = int(os.getenv("LOGIN_CONCURRENCY_PER_IP", "4"))
+    auth_cache_size: int = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+    auth_cache_ttl: float = float(os.getenv("AUTH_CACHE_TTL", "300"))
     gemini_api_key: str | None = os.getenv("GEMINI_API_KEY")
+    llm_provider: str = os.getenv("LLM_PROVIDER", "gemini")
+    llm_model: str | None = os.getenv("LLM_MODEL")
+    openai_base_url: str = os.getenv("OPENAI_BASE_URL", "http://localhost:8080/v1")
+    openai_api_key: str | None = os.getenv("OPENAI_API_KEY")
+    stub_latency_ms: float = float(os.getenv("STUB_LATENCY_MS", "800"))
+    stub_tokens_per_second: float = float(os.getenv("STUB_TOKENS_PER_SECOND", "50"))
+    stub_tokens: int = int(os.getenv("STUB_TOKENS", "300"))
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+    llm_global_concurrency: int = int(os.getenv("LLM_GLOBAL_CONCURRENCY", "8"))
+    llm_weight_interactive: float = float(os.getenv("LLM_WEIGHT_INTERACTIVE", "4"))
+    llm_weight_bulk: float = float(os.getenv("LLM_WEIGHT_BULK", "1"))
+    llm_daily_request_quota: int = int(os.getenv("LLM_DAILY_REQUEST_QUOTA", "1000"))
+    llm_daily_token_quota: int = int(os.getenv("LLM_DAILY_TOKEN_QUOTA", "2000000"))
+    llm_cache_size: int = int(os.getenv("LLM_CACHE_SIZE", "512"))
+    llm_cache_path: str | None = os.getenv("LLM_CACHE_PATH")
+    llm_cache_ttl_outline: float = float(os.getenv("LLM_CACHE_TTL_OUTLINE", "86400"))
+    llm_cache_ttl_section: float = float(os.getenv("LLM_CACHE_TTL_SECTION", "3600"))
+    llm_cache_ttl_refine: float = float(os.getenv("LLM_CACHE_TTL_REFINE", "600"))
+    llm_tokenizer: str = os.getenv("LLM_TOKENIZER", "estimate")
+    llm_input_tokens_outline: int = int(os.getenv("LLM_INPUT_TOKENS_OUTLINE", "512"))
+    llm_input_tokens_section: int = int(os.getenv("LLM_INPUT_TOKENS_SECTION", "1024"))
+    llm_input_tokens_refine: int = int(os.getenv("LLM_INPUT_TOKENS_REFINE", "6000"))
+    llm_output_tokens_outline: int = int(os.getenv("LLM_OUTPUT_TOKENS_OUTLINE", "512"))
+    llm_output_tokens_section: int = int(os.getenv("LLM_OUTPUT_TOKENS_SECTION", "1536"))
+    llm_output_tokens_refine: int = int(os.getenv("LLM_OUTPUT_TOKENS_REFINE", "4096"))
+    llm_timeout: float = float(os.getenv("LLM_TIMEOUT", "30"))
+    llm_deadline: float = float(os.getenv("LLM_DEADLINE", "60"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    llm_retry_base_delay: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    llm_retry_max_delay: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+    llm_hedge_after: float = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+    llm_breaker_window: int = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+    llm_breaker_failure_rate: float = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+    llm_breaker_min_calls: int = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+    llm_breaker_reset_after: float = float(os.getenv("LLM_BREAKER_RESET_AFTER", "30"))
+    export_cache_dir: str = os.getenv("EXPORT_CACHE_DIR", "./storage/export_cache")
+    export_cache_max_bytes: int = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    export_workers: int = int(os.getenv("EXPORT_WORKERS", "2"))
+    export_artifact_dir: str = os.getenv("EXPORT_ARTIFACT_DIR", "./storage/exports")
+    export_artifact_ttl: int = int(os.getenv("EXPORT_ARTIFACT_TTL", str(24 * 3600)))
+    export_sync_max_sections: int = int(os.getenv("EXPORT_SYNC_MAX_SECTIONS", "40"))
+    export_template_dir: str | None = os.getenv("EXPORT_TEMPLATE_DIR")
+    pptx_body_font_pt: float = float(os.getenv("PPTX_BODY_FONT_PT", "20"))
+    pptx_layout_cache_size: int = int(os.getenv("PPTX_LAYOUT_CACHE_SIZE", "4096"))
+    export_stream_chunk_size: int = int(os.getenv("EXPORT_STREAM_CHUNK_SIZE", "50"))
+    project_page_size: int = int(os.getenv("PROJECT_PAGE_SIZE", "50"))
+    project_page_max: int = int(os.getenv("PROJECT_PAGE_MAX", "200"))
+    section_preview_chars: int = int(os.getenv("SECTION_PREVIEW_CHARS", "200"))
+    job_workers: int = int(os.getenv("JOB_WORKERS", "1"))
+    worker_threads: int = int(os.getenv("WORKER_THREADS", "2"))
+    job_poll_interval: float = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    job_heartbeat_interval: float = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+    job_stale_after: float = float(os.getenv("JOB_STALE_AFTER", "60"))
+    job_max_attempts: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
 
 
 @lru_cache
@@ -1,9 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from .auth import password_hasher
 from .config import get_settings
 from .database import init_db
-from .routes import auth, exports, projects, sections, templates
+from .routes import auth, exports, jobs, projects, search, sections, templates
+from .services.export_cache import export_cache
+from .services.exports import recover_artifacts, renderer
+from .services.jobs import job_worker
+from .services.llm import llm_service
+from .services.metrics import metrics as app_metrics
+from .services.prompts import PromptTooLarge
+from .services.scheduler import QuotaExceeded, llm_scheduler
+from .services.single_flight import single_flight
+from .services.write_queue import write_queue
+from .utils.slide_layout import slide_text_layout
 
 
 settings = get_settings()
@@ -15,12 +27,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded(request: Request, exc: QuotaExceeded) -> JSONResponse:
+    return JSONResponse(
+        status_code=429, content={"detail": exc.detail}, headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(PromptTooLarge)
+async def prompt_too_large(request: Request, exc: PromptTooLarge) -> JSONResponse:
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+
 @app.on_event("startup")
 def on_startup() -> None:
     init_db()
+    recover_artifacts()
+    if settings.job_workers > 0:
+        job_worker.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    job_worker.stop(timeout=5)
+    write_queue.stop(timeout=5)
+    password_hasher.shutdown()
+    renderer.shutdown()
 
 
 @app.get("/health")
@@ -28,9 +64,26 @@ def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics() -> dict[str, dict]:
+    breaker = llm_service.client.breaker.state.value if llm_service.client else None
+    return {
+        "counters": app_metrics.snapshot(),
+        "llm_cache": llm_service.cache.stats(),
+        "export_cache": export_cache.stats(),
+        "pptx_layout": slide_text_layout.stats(),
+        "llm_breaker": {"state": breaker},
+        "write_queue": {"batches": write_queue.batches, "writes": write_queue.writes},
+        "single_flight": single_flight.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+    }
+
+
 app.include_router(auth.router)
 app.include_router(projects.router)
 app.include_router(sections.router)
 app.include_router(templates.router)
 app.include_router(exports.router)
+app.include_router(jobs.router)
+app.include_router(search.router)
 
@@ -0,0 +1,134 @@
+"""Versioned schema migrations applied by `init_db`.
+
+Version 1 creates any missing tables from the current models, so fresh databases are complete
+after it runs. Later versions bring existing databases up to date with changes `create_all`
+cannot make to tables that already exist (new indexes, columns, virtual tables). Each migration
+must therefore be safe to run against a schema that already has its change.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import INTEGER, VARCHAR, Column, DateTime, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+from .models import DocumentSection, ExportArtifact, LLMUsage, Project, Revision, User
+from .services.search import create_search_index
+
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str) -> Callable[[Callable[[Connection], None]], Callable[[Connection], None]]:
+    def decorator(apply: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        MIGRATIONS.append(Migration(version, description, apply))
+        MIGRATIONS.sort(key=lambda item: item.version)
+        return apply
+
+    return decorator
+
+
+def add_column_if_missing(connection: Connection, table_name: str, column: Column) -> None:
+    if column.name in {existing["name"] for existing in inspect(connection).get_columns(table_name)}:
+        return
+    column_type = column.type.compile(dialect=connection.dialect)
+    default = column.server_default.arg if column.server_default is not None else None
+    clause = f" NOT NULL DEFAULT {default}" if default is not None else ""
+    quote = connection.dialect.identifier_preparer.quote
+    connection.execute(text(f"ALTER TABLE {quote(table_name)} ADD COLUMN {quote(column.name)} {column_type}{clause}"))
+
+
+@migration(1, "baseline schema")
+def _baseline(connection: Connection) -> None:
+    SQLModel.metadata.create_all(connection)
+
+
+@migration(2, "composite indexes for project, section and revision lookups")
+def _hot_lookup_indexes(connection: Connection) -> None:
+    for table in (Project.__table__, DocumentSection.__table__, Revision.__table__):
+        existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+        for index in table.indexes:
+            # Indexes over columns a later migration adds are created by that migration.
+            if {column.name for column in index.columns} <= existing:
+                index.create(connection, checkfirst=True)
+
+
+@migration(3, "export artifacts table")
+def _export_artifacts(connection: Connection) -> None:
+    ExportArtifact.__table__.create(connection, checkfirst=True)
+
+
+@migration(4, "export artifact template")
+def _export_artifact_template(connection: Connection) -> None:
+    add_column_if_missing(
+        connection, ExportArtifact.__tablename__, Column("template", VARCHAR(), server_default=text("'default'"))
+    )
+
+
+@migration(5, "revision token counts")
+def _revision_token_counts(connection: Connection) -> None:
+    for name in ("prompt_tokens", "completion_tokens"):
+        add_column_if_missing(connection, Revision.__tablename__, Column(name, INTEGER()))
+
+
+@migration(6, "llm usage table and per-user quotas")
+def _llm_usage(connection: Connection) -> None:
+    LLMUsage.__table__.create(connection, checkfirst=True)
+    for name in ("daily_request_quota", "daily_token_quota"):
+        add_column_if_missing(connection, User.__tablename__, Column(name, INTEGER()))
+
+
+@migration(7, "project and section change versions")
+def _change_versions(connection: Connection) -> None:
+    for table in (Project.__table__, DocumentSection.__table__):
+        add_column_if_missing(connection, table.name, Column("version", INTEGER(), server_default=text("0")))
+    for index in DocumentSection.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+@migration(8, "full-text search index")
+def _search_index(connection: Connection) -> None:
+    create_search_index(connection)
+
+
+@migration(9, "export artifact heartbeat")
+def _export_artifact_heartbeat(connection: Connection) -> None:
+    add_column_if_missing(connection, ExportArtifact.__tablename__, Column("heartbeat_at", DateTime()))
+
+
+def current_version(connection: Connection) -> int:
+    return connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar_one()
+
+
+def run_migrations(engine: Engine) -> int:
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS schema_version ("
+                "version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TIMESTAMP NOT NULL)"
+            )
+        )
+        applied = current_version(connection)
+        for item in MIGRATIONS:
+            if item.version <= applied:
+                continue
+            logger.info("Applying migration %s: %s", item.version, item.description)
+            item.apply(connection)
+            connection.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": item.version, "d": item.description, "t": datetime.utcnow()},
+            )
+            applied = item.version
+        return applied
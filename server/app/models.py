@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 from typing import Optional
 
+from sqlalchemy import JSON, Column, Index, UniqueConstraint
 from sqlmodel import Field, SQLModel
 
 
@@ -23,26 +24,55 @@ class FeedbackChoice(str, Enum):
     dislike = "dislike"
 
 
+class RefineMode(str, Enum):
+    full = "full"
+    incremental = "incremental"
+
+
+class ProjectView(str, Enum):
+    full = "full"
+    summary = "summary"
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     email: str = Field(index=True, unique=True)
     full_name: str
     hashed_password: str
+    # Per-user overrides of LLM_DAILY_REQUEST_QUOTA / LLM_DAILY_TOKEN_QUOTA; 0 means unlimited.
+    daily_request_quota: Optional[int] = None
+    daily_token_quota: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class Project(SQLModel, table=True):
+    __table_args__ = (Index("ix_project_owner_created", "owner_id", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     owner_id: int = Field(foreign_key="user.id")
     title: str
     topic: str
     doc_type: DocType
     status: ProjectStatus = Field(default=ProjectStatus.draft)
+    # Advanced on every change to the project or its sections; see app/versioning.py.
+    version: int = Field(default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class DocumentSection(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_documentsection_project_position", "project_id", "position"),
+        Index("ix_documentsection_project_version", "project_id", "version"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     project_id: int = Field(foreign_key="project.id")
     title: str
@@ -50,16 +80,66 @@ class DocumentSection(SQLModel, table=True):
     content: str = Field(default="")
     feedback: Optional[FeedbackChoice] = None
     last_comment: Optional[str] = None
+    # The project version at which this section last changed.
+    version: int = Field(default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class Revision(SQLModel, table=True):
+    __table_args__ = (Index("ix_revision_section_created", "section_id", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     section_id: int = Field(foreign_key="documentsection.id")
     prompt: Optional[str] = None
     response: Optional[str] = None
     comment: Optional[str] = None
     feedback: Optional[FeedbackChoice] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+
+class Job(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="project.id", index=True)
+    owner_id: int = Field(foreign_key="user.id")
+    kind: str = Field(default="generate")
+    status: JobStatus = Field(default=JobStatus.queued, index=True)
+    regenerate: bool = Field(default=False)
+    total_sections: int = Field(default=0)
+    completed_sections: int = Field(default=0)
+    progress: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False, default=dict))
+    attempts: int = Field(default=0)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class LLMUsage(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("user_id", "day", name="uq_llmusage_user_day"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    day: date
+    requests: int = Field(default=0)
+    tokens: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ExportArtifact(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="project.id", index=True)
+    owner_id: int = Field(foreign_key="user.id", index=True)
+    format: DocType
+    template: str = Field(default="default")
+    status: JobStatus = Field(default=JobStatus.queued)
+    content_version: str
+    path: Optional[str] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
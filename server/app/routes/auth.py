@@ -1,45 +1,67 @@
+import asyncio
 from datetime import timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..auth import create_access_token, get_password_hash, verify_password
+from ..auth import create_access_token, get_current_user, password_hasher
 from ..config import get_settings
-from ..database import get_session
+from ..database import get_async_session
 from ..models import User
-from ..schemas import Token, UserCreate, UserRead
+from ..schemas import Token, UsageRead, UserCreate, UserRead
+from ..services.rate_limit import ConcurrencyLimiter
+from ..services.scheduler import llm_scheduler
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 settings = get_settings()
+login_limiter = ConcurrencyLimiter(settings.login_concurrency_per_ip)
 
 
 @router.post("/register", response_model=UserRead)
-def register_user(payload: UserCreate, session: Session = Depends(get_session)) -> User:
-    existing = session.exec(select(User).where(User.email == payload.email)).first()
-    if existing:
+async def register_user(payload: UserCreate, session: AsyncSession = Depends(get_async_session)) -> User:
+    result = await session.exec(select(User).where(User.email == payload.email))
+    if result.first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
     user = User(
         email=payload.email.lower(),
         full_name=payload.full_name,
-        hashed_password=get_password_hash(payload.password),
+        hashed_password=await password_hasher.hash(payload.password),
     )
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     return user
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> Token:
-    user = session.exec(select(User).where(User.email == form_data.username.lower())).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect credentials")
+    client_ip = request.client.host if request.client else "unknown"
+    with login_limiter.slot(client_ip):
+        result = await session.exec(select(User).where(User.email == form_data.username.lower()))
+        user = result.first()
+        verified, new_hash = (
+            await password_hasher.verify_and_update(form_data.password, user.hashed_password) if user else (False, None)
+        )
+        if not verified:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect credentials")
+        if new_hash:
+            user.hashed_password = new_hash
+            session.add(user)
+            await session.commit()
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     token = create_access_token(data={"sub": str(user.id)}, expires_delta=access_token_expires)
     return Token(access_token=token)
 
+
+@router.get("/usage", response_model=UsageRead)
+async def get_usage(current_user: User = Depends(get_current_user)) -> UsageRead:
+    """Today's model requests and tokens against the caller's daily quota."""
+    usage = await asyncio.to_thread(llm_scheduler.quotas.usage, current_user.id)
+    return UsageRead(**usage)
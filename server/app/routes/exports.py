@@ -1,25 +1,201 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+import asyncio
+from collections import defaultdict
+from io import BytesIO
+from typing import BinaryIO, Iterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.responses import StreamingResponse
-from sqlmodel import Session
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..auth import get_current_user
-from ..database import get_session
-from ..models import DocType, DocumentSection, Project, User
-from ..routes.projects import _project_sections
+from ..config import get_settings
+from ..database import get_async_session, get_session
+from ..models import DocType, DocumentSection, ExportArtifact, JobStatus, Project, User
+from ..routes.projects import _project_sections, _project_sections_async
+from ..schemas import BulkExportRequest, ExportArtifactRead, ExportTemplateRead
+from ..services.export_cache import cache_prefix, content_version, export_cache
+from ..services.exports import (
+    enqueue_export,
+    is_stale,
+    iter_project_sections,
+    recover_artifacts,
+    stream_bulk_export,
+)
 from ..utils.docx_export import build_docx
+from ..utils.office_templates import OfficeTemplate, TemplateNotFound, office_templates
+from ..utils.ooxml_stream import stream_docx, stream_pptx
 from ..utils.pptx_export import build_pptx
+from ..utils.ranges import CHUNK_SIZE, etag_matches, ranged_file_response
 
 
 router = APIRouter(prefix="/export", tags=["export"])
+settings = get_settings()
+
+MEDIA_TYPES = {
+    DocType.docx: "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    DocType.pptx: "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+
+def _check_sync_size(sections: list[DocumentSection]) -> None:
+    if len(sections) > settings.export_sync_max_sections:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Projects with more than {settings.export_sync_max_sections} sections must be exported via POST /export/{{id}}",
+        )
+
+
+def _template(name: Optional[str], format: DocType) -> OfficeTemplate:
+    try:
+        return office_templates.get(name, format)
+    except TemplateNotFound as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc.args[0])) from None
+
+
+def _render(project: Project, sections: list[DocumentSection], template: OfficeTemplate) -> BytesIO:
+    build = build_docx if template.doc_type == DocType.docx else build_pptx
+    return build(project, sections, template)
+
+
+def _read_cached(handle: BinaryIO) -> Iterator[bytes]:
+    with handle:
+        while chunk := handle.read(CHUNK_SIZE):
+            yield chunk
+
+
+def _filename(project: Project, format: DocType) -> str:
+    return f'attachment; filename="{project.title}.{format.value}"'
+
+
+async def _load_artifact(session: AsyncSession, artifact_id: int, current_user: User) -> ExportArtifact:
+    artifact = await session.get(ExportArtifact, artifact_id)
+    if not artifact or artifact.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Export not found")
+    if is_stale(artifact):
+        await asyncio.to_thread(recover_artifacts)
+        await session.refresh(artifact)
+    return artifact
+
+
+@router.get("/templates", response_model=list[ExportTemplateRead])
+def list_templates(current_user: User = Depends(get_current_user)) -> list[ExportTemplateRead]:
+    return [ExportTemplateRead(name=name, format=format) for name, format in office_templates.available()]
+
+
+@router.get("/artifacts/{artifact_id}/status", response_model=ExportArtifactRead)
+async def get_artifact_status(
+    artifact_id: int,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> ExportArtifact:
+    return await _load_artifact(session, artifact_id, current_user)
+
+
+@router.get("/artifacts/{artifact_id}")
+async def download_artifact(
+    artifact_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> Response:
+    artifact = await _load_artifact(session, artifact_id, current_user)
+    if artifact.status != JobStatus.succeeded or not artifact.path:
+        detail = artifact.error if artifact.status == JobStatus.failed else "Export is not ready yet"
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+    project = await session.get(Project, artifact.project_id)
+    headers = {
+        "ETag": f'"{artifact.format.value}-{artifact.template}-{artifact.content_version}"',
+        "Content-Disposition": _filename(project, artifact.format),
+    }
+    return ranged_file_response(artifact.path, MEDIA_TYPES[artifact.format], request.headers.get("range"), headers)
+
+
+@router.post("/bulk")
+async def export_bulk(
+    payload: BulkExportRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> StreamingResponse:
+    templates = {format: _template(payload.template, format).name for format in dict.fromkeys(payload.formats)}
+    project_ids = list(dict.fromkeys(payload.project_ids))
+    result = await session.exec(
+        select(Project).where(Project.id.in_(project_ids), Project.owner_id == current_user.id)
+    )
+    projects = {project.id: project for project in result.all()}
+    missing = [project_id for project_id in project_ids if project_id not in projects]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Projects not found: {', '.join(map(str, missing))}"
+        )
+
+    result = await session.exec(
+        select(DocumentSection)
+        .where(DocumentSection.project_id.in_(project_ids))
+        .order_by(DocumentSection.project_id, DocumentSection.position)
+    )
+    sections = defaultdict(list)
+    for section in result.all():
+        sections[section.project_id].append(section)
+
+    return StreamingResponse(
+        stream_bulk_export([projects[project_id] for project_id in project_ids], sections, templates),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="projects.zip"'},
+    )
+
+
+@router.post("/{project_id}", response_model=ExportArtifactRead, status_code=status.HTTP_202_ACCEPTED)
+async def create_export(
+    project_id: int,
+    format: DocType,
+    template: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> ExportArtifact:
+    office_template = _template(template, format)
+    project = await session.get(Project, project_id)
+    if not project or project.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    sections = await _project_sections_async(session, project.id)
+    if not sections:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No content to export")
+    return await enqueue_export(session, project, sections, format, office_template.name)
+
+
+@router.get("/{project_id}/stream")
+def export_project_stream(
+    project_id: int,
+    format: DocType,
+    template: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+) -> StreamingResponse:
+    office_template = _template(template, format)
+    project = session.get(Project, project_id)
+    if not project or project.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    if session.exec(select(DocumentSection.id).where(DocumentSection.project_id == project.id).limit(1)).first() is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No content to export")
+
+    sections = iter_project_sections(project.id, settings.export_stream_chunk_size)
+    stream = stream_docx if format == DocType.docx else stream_pptx
+    body = stream(project, sections, office_template)
+    return StreamingResponse(
+        body, media_type=MEDIA_TYPES[format], headers={"Content-Disposition": _filename(project, format)}
+    )
 
 
 @router.get("/{project_id}")
 def export_project(
     project_id: int,
     format: DocType,
+    request: Request,
+    template: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ) -> Response:
+    office_template = _template(template, format)
     project = session.get(Project, project_id)
     if not project or project.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
@@ -27,18 +203,26 @@ def export_project(
     if not sections:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No content to export")
 
-    if format == DocType.docx:
-        buffer = build_docx(project, sections)
-        filename = f"{project.title}.docx"
-        media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    else:
-        buffer = build_pptx(project, sections)
-        filename = f"{project.title}.pptx"
-        media_type = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+    version = content_version(project, sections)
+    etag = f'"{format.value}-{office_template.name}-{version}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": _filename(project, format),
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
-    return StreamingResponse(
-        buffer,
-        media_type=media_type,
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    if not export_cache.enabled:
+        _check_sync_size(sections)
+        buffer = _render(project, sections, office_template)
+        return StreamingResponse(buffer, media_type=MEDIA_TYPES[format], headers=headers)
 
+    prefix = cache_prefix(project.id, format, office_template.name)
+    handle = export_cache.open(prefix + version)
+    if handle is not None:
+        return StreamingResponse(_read_cached(handle), media_type=MEDIA_TYPES[format], headers=headers)
+    _check_sync_size(sections)
+    buffer = _render(project, sections, office_template)
+    export_cache.put(prefix + version, buffer.getvalue(), replaces_prefix=prefix)
+    return StreamingResponse(buffer, media_type=MEDIA_TYPES[format], headers=headers)
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel import Session
+
+from ..auth import get_current_user
+from ..database import get_session
+from ..models import Job, User
+from ..schemas import JobRead, JobSectionProgress
+
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def to_job_read(job: Job) -> JobRead:
+    return JobRead(
+        id=job.id,
+        project_id=job.project_id,
+        kind=job.kind,
+        status=job.status,
+        total_sections=job.total_sections,
+        completed_sections=job.completed_sections,
+        attempts=job.attempts,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        sections=[
+            JobSectionProgress(section_id=int(section_id), status=state)
+            for section_id, state in job.progress.items()
+        ],
+    )
+
+
+@router.get("/{job_id}", response_model=JobRead)
+def get_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+) -> JobRead:
+    job = session.get(Job, job_id)
+    if not job or job.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return to_job_read(job)
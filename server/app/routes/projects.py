@@ -1,23 +1,51 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..auth import get_current_user
-from ..database import get_session
-from ..models import DocumentSection, Project, ProjectStatus, Revision, User
+from ..config import get_settings
+from ..database import async_engine, get_async_session
+from ..models import DocumentSection, Job, Project, ProjectStatus, ProjectView, Revision, User
 from ..schemas import (
     GenerateRequest,
+    JobRead,
+    ProjectChanges,
     ProjectCreate,
     ProjectDetail,
     ProjectRead,
+    ProjectRefineRequest,
+    ProjectSummary,
     SectionRead,
+    SectionSummary,
 )
-from ..services.llm import llm_service
+from ..services.jobs import (
+    active_generation,
+    enqueue_generation,
+    finish_stream_job,
+    keep_stream_job_alive,
+    start_stream_job,
+)
+from ..services.llm import Completion, llm_service
+from ..services.scheduler import llm_scheduler, llm_work
+from ..services.single_flight import payload_key, single_flight
+from ..services.write_queue import write_queue
+from ..utils.ranges import etag_matches
+from ..utils.sse import sse_event, sse_response
+from .jobs import to_job_read
 
 
 router = APIRouter(prefix="/projects", tags=["projects"])
+settings = get_settings()
 
 
 def _project_sections(session: Session, project_id: int) -> List[DocumentSection]:
@@ -26,6 +54,24 @@ def _project_sections(session: Session, project_id: int) -> List[DocumentSection
     ).all()
 
 
+async def _project_sections_async(session: AsyncSession, project_id: int) -> List[DocumentSection]:
+    result = await session.exec(
+        select(DocumentSection).where(DocumentSection.project_id == project_id).order_by(DocumentSection.position)
+    )
+    return result.all()
+
+
+async def _active_generation_for(session: AsyncSession, project_id: int, regenerate: bool) -> Optional[Job]:
+    """The running generation job a repeated request should attach to; a different one is a conflict."""
+    active = await active_generation(session, project_id)
+    if active is not None and active.regenerate != regenerate:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Generation job {active.id} is already running for this project",
+        )
+    return active
+
+
 def _to_detail(project: Project, sections: List[DocumentSection]) -> ProjectDetail:
     return ProjectDetail(
         id=project.id,
@@ -33,25 +79,83 @@ def _to_detail(project: Project, sections: List[DocumentSection]) -> ProjectDeta
         topic=project.topic,
         doc_type=project.doc_type,
         status=project.status,
+        version=project.version,
         created_at=project.created_at,
         updated_at=project.updated_at,
         sections=[SectionRead.model_validate(section) for section in sections],
     )
 
 
+def _to_summary(project: Project, sections: List[DocumentSection]) -> ProjectSummary:
+    return ProjectSummary(
+        id=project.id,
+        title=project.title,
+        topic=project.topic,
+        doc_type=project.doc_type,
+        status=project.status,
+        version=project.version,
+        created_at=project.created_at,
+        updated_at=project.updated_at,
+        sections=[
+            SectionSummary(
+                id=section.id,
+                title=section.title,
+                position=section.position,
+                preview=section.content[: settings.section_preview_chars],
+                content_length=len(section.content),
+                content_hash=hashlib.sha256(section.content.encode("utf-8")).hexdigest(),
+                feedback=section.feedback,
+                last_comment=section.last_comment,
+                version=section.version,
+                created_at=section.created_at,
+                updated_at=section.updated_at,
+            )
+            for section in sections
+        ],
+    )
+
+
+def _encode_cursor(project: Project) -> str:
+    raw = json.dumps([project.created_at.isoformat(), project.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, project_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(project_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from None
+
+
 @router.get("/", response_model=list[ProjectRead])
-def list_projects(
+async def list_projects(
+    response: Response,
+    limit: int = Query(settings.project_page_size, ge=1, le=settings.project_page_max),
+    cursor: Optional[str] = Query(None, description="`X-Next-Cursor` from the previous page"),
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> list[Project]:
-    return session.exec(select(Project).where(Project.owner_id == current_user.id).order_by(Project.created_at)).all()
+    # Keyset pagination on (created_at, id) walks ix_project_owner_created instead of counting past an offset.
+    statement = select(Project).where(Project.owner_id == current_user.id)
+    if cursor is not None:
+        created_at, project_id = _decode_cursor(cursor)
+        statement = statement.where(
+            or_(Project.created_at > created_at, and_(Project.created_at == created_at, Project.id > project_id))
+        )
+    result = await session.exec(statement.order_by(Project.created_at, Project.id).limit(limit + 1))
+    projects = result.all()
+    if len(projects) > limit:
+        projects = projects[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(projects[-1])
+    return projects
 
 
 @router.post("/", response_model=ProjectDetail, status_code=status.HTTP_201_CREATED)
-def create_project(
+async def create_project(
     payload: ProjectCreate,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> ProjectDetail:
     project = Project(
         owner_id=current_user.id,
@@ -61,8 +165,8 @@ def create_project(
         status=ProjectStatus.draft,
     )
     session.add(project)
-    session.commit()
-    session.refresh(project)
+    await session.commit()
+    await session.refresh(project)
 
     for section in payload.sections:
         session.add(
@@ -72,62 +176,260 @@ def create_project(
                 position=section.position,
             )
         )
-    session.commit()
+    await session.commit()
 
-    sections = _project_sections(session, project.id)
+    sections = await _project_sections_async(session, project.id)
     return _to_detail(project, sections)
 
 
-@router.get("/{project_id}", response_model=ProjectDetail)
-def get_project(
+@router.get("/{project_id}", response_model=Union[ProjectDetail, ProjectSummary])
+async def get_project(
     project_id: int,
+    request: Request,
+    response: Response,
+    view: ProjectView = Query(
+        ProjectView.full, description="`summary` replaces section content with a preview, its length and hash"
+    ),
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
-) -> ProjectDetail:
-    project = session.get(Project, project_id)
+    session: AsyncSession = Depends(get_async_session),
+) -> Union[ProjectDetail, ProjectSummary, Response]:
+    project = await session.get(Project, project_id)
     if not project or project.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
-    sections = _project_sections(session, project.id)
+    etag = f'"project-{project.id}-{project.version}-{view.value}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    sections = await _project_sections_async(session, project.id)
+    if view == ProjectView.summary:
+        return _to_summary(project, sections)
     return _to_detail(project, sections)
 
 
-@router.post("/{project_id}/generate", response_model=ProjectDetail)
-def generate_content(
+@router.get("/{project_id}/changes", response_model=ProjectChanges)
+async def get_project_changes(
+    project_id: int,
+    since: int = Query(..., ge=0, description="The `version` the client already holds"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> ProjectChanges:
+    project = await session.get(Project, project_id)
+    if not project or project.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    if since > project.version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Version {since} is ahead of the project's version {project.version}; reload the project",
+        )
+    # Read after the project row: a section written in between is at worst sent again next time.
+    sections = []
+    if since < project.version:
+        result = await session.exec(
+            select(DocumentSection)
+            .where(DocumentSection.project_id == project.id, DocumentSection.version > since)
+            .order_by(DocumentSection.position)
+        )
+        sections = result.all()
+    detail = _to_detail(project, sections)
+    return ProjectChanges(**detail.model_dump(exclude={"sections"}), since=since, sections=detail.sections)
+
+
+@router.post("/{project_id}/generate", response_model=JobRead, status_code=status.HTTP_202_ACCEPTED)
+async def generate_content(
     project_id: int,
     payload: GenerateRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
-) -> ProjectDetail:
-    project = session.get(Project, project_id)
+    session: AsyncSession = Depends(get_async_session),
+) -> JobRead:
+    project = await session.get(Project, project_id)
     if not project or project.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
 
-    sections = _project_sections(session, project.id)
+    sections = await _project_sections_async(session, project.id)
     if not sections:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Project has no sections")
 
-    project.status = ProjectStatus.generating
-    session.add(project)
-    session.commit()
-
-    for section in sections:
-        if not section.content or payload.regenerate:
-            section.content = llm_service.generate_section(project.topic, section.title)
-            section.updated_at = datetime.utcnow()
-            session.add(section)
-            session.add(
-                Revision(
-                    section_id=section.id,
-                    prompt="initial generation" if not payload.regenerate else "regeneration",
-                    response=section.content,
-                )
+    await llm_scheduler.acheck_quota(current_user.id)
+
+    async def enqueue() -> JobRead:
+        async with AsyncSession(async_engine, expire_on_commit=False) as write_session:
+            active = await _active_generation_for(write_session, project_id, payload.regenerate)
+            if active is not None:
+                return to_job_read(active)
+            stored = await write_session.get(Project, project_id)
+            return to_job_read(await enqueue_generation(write_session, stored, sections, payload.regenerate))
+
+    # Concurrent duplicates share one enqueue; later retries find the job it created.
+    return await single_flight.run("generate", (project_id, payload_key(payload.regenerate)), enqueue)
+
+
+@router.post("/{project_id}/generate/stream")
+async def generate_content_stream(
+    project_id: int,
+    payload: GenerateRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> StreamingResponse:
+    project = await session.get(Project, project_id)
+    if not project or project.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+
+    sections = await _project_sections_async(session, project.id)
+    if not sections:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Project has no sections")
+    if await active_generation(session, project.id) is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="A generation job is already running for this project"
+        )
+
+    await llm_scheduler.acheck_quota(current_user.id)
+    pending = [
+        (section.id, section.title, llm_service.section_prompt(project.topic, section.title))
+        for section in sections
+        if not section.content or payload.regenerate
+    ]
+    prompt_label = "initial generation" if not payload.regenerate else "regeneration"
+    user_id = current_user.id
+
+    job = await start_stream_job(session, project, [section_id for section_id, _, _ in pending], payload.regenerate)
+    job_id = job.id
+
+    async def events() -> AsyncIterator[str]:
+        completed = False
+        error = "Stream closed before generation finished"
+        completions: dict[int, Completion] = {}
+        heartbeat = asyncio.ensure_future(keep_stream_job_alive(job_id))
+        try:
+            for section_id, title, prompt in pending:
+                yield sse_event("section", {"section_id": section_id, "title": title})
+                chunks = []
+                with llm_work(user_id):
+                    async for chunk in llm_service.astream_section(prompt, use_cache=not payload.regenerate):
+                        chunks.append(chunk)
+                        yield sse_event("chunk", {"section_id": section_id, "text": chunk})
+                completions[section_id] = llm_service.completion(prompt, "".join(chunks).strip())
+
+            async with AsyncSession(async_engine, expire_on_commit=False) as write_session:
+                now = datetime.utcnow()
+                for section_id, completion in completions.items():
+                    section = await write_session.get(DocumentSection, section_id)
+                    section.content = completion.text
+                    section.updated_at = now
+                    write_session.add(section)
+                    write_session.add(
+                        Revision(
+                            section_id=section_id,
+                            prompt=prompt_label,
+                            response=completion.text,
+                            prompt_tokens=completion.prompt_tokens,
+                            completion_tokens=completion.completion_tokens,
+                        )
+                    )
+                stored = await write_session.get(Project, project_id)
+                stored.status = ProjectStatus.ready
+                stored.updated_at = now
+                write_session.add(stored)
+                await finish_stream_job(write_session, job_id)
+                await write_session.commit()
+                detail = _to_detail(stored, await _project_sections_async(write_session, project_id))
+            completed = True
+            yield sse_event("done", detail.model_dump(mode="json"))
+        except Exception as exc:
+            error = str(exc) or "Generation failed"
+            yield sse_event("error", {"detail": error})
+        finally:
+            heartbeat.cancel()
+            if not completed:
+                async with AsyncSession(async_engine) as write_session:
+                    await finish_stream_job(write_session, job_id, error)
+                    await write_session.commit()
+
+    return sse_response(events())
+
+
+@router.post("/{project_id}/refine", response_model=ProjectDetail)
+async def refine_project(
+    project_id: int,
+    payload: ProjectRefineRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> ProjectDetail:
+    project = await session.get(Project, project_id)
+    if not project or project.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+
+    sections = await _project_sections_async(session, project.id)
+    if payload.section_ids is not None:
+        requested = set(payload.section_ids)
+        missing = requested - {section.id for section in sections}
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Sections not found: {', '.join(str(section_id) for section_id in sorted(missing))}",
             )
+        sections = [section for section in sections if section.id in requested]
+    targets = [(section.id, section.title, section.content) for section in sections if section.content]
+    if not targets:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No section content to refine")
 
-    project.status = ProjectStatus.ready
-    project.updated_at = datetime.utcnow()
-    session.add(project)
-    session.commit()
+    topic = project.topic
+    key = payload_key(payload.prompt, payload.mode, [(section.id, section.updated_at) for section in sections])
 
-    sections = _project_sections(session, project.id)
-    return _to_detail(project, sections)
+    async def run() -> ProjectDetail:
+        limit = asyncio.Semaphore(max(1, settings.llm_max_concurrency))
+
+        async def refine(title: str, content: str) -> Completion:
+            async with limit:
+                return await llm_service.arefine_section(topic, title, content, payload.prompt, payload.mode)
+
+        tasks = [asyncio.ensure_future(refine(title, content)) for _, title, content in targets]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        updates = {section_id: completion for (section_id, _, _), completion in zip(targets, results)}
 
+        def apply(write_session: Session) -> ProjectDetail:
+            now = datetime.utcnow()
+            stored_sections = write_session.exec(
+                select(DocumentSection).where(DocumentSection.id.in_(list(updates)))
+            ).all()
+            for section in stored_sections:
+                completion = updates[section.id]
+                section.content = completion.text
+                section.updated_at = now
+                write_session.add(section)
+                write_session.add(
+                    Revision(
+                        section_id=section.id,
+                        prompt=payload.prompt,
+                        response=completion.text,
+                        prompt_tokens=completion.prompt_tokens,
+                        completion_tokens=completion.completion_tokens,
+                    )
+                )
+            stored = write_session.get(Project, project_id)
+            stored.updated_at = now
+            write_session.add(stored)
+            write_session.flush()
+            return _to_detail(stored, _project_sections(write_session, project_id))
+
+        return await write_queue.run(apply)
+
+    with llm_work(current_user.id):
+        return await single_flight.run("refine_project", (project_id, key), run)
+
+
+@router.get("/{project_id}/jobs", response_model=list[JobRead])
+async def list_project_jobs(
+    project_id: int,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> list[JobRead]:
+    project = await session.get(Project, project_id)
+    if not project or project.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    result = await session.exec(select(Job).where(Job.project_id == project.id).order_by(Job.created_at.desc()))
+    return [to_job_read(job) for job in result.all()]
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..auth import get_current_user
+from ..database import get_async_session
+from ..models import User
+from ..schemas import SearchHit
+from ..services.search import SearchUnavailable, search
+
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("", response_model=list[SearchHit])
+async def search_documents(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in titles, topics and sections"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> list[dict]:
+    try:
+        return await search(session, current_user.id, q, limit)
+    except SearchUnavailable as exc:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(exc)) from None
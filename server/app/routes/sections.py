@@ -1,82 +1,152 @@
 from datetime import datetime
+from typing import AsyncIterator
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..auth import get_current_user
-from ..database import get_session
+from ..database import get_async_session
 from ..models import DocumentSection, Project, Revision, User
 from ..schemas import CommentRequest, FeedbackRequest, RefineRequest, SectionRead
-from ..services.llm import llm_service
+from ..services.llm import Completion, llm_service
+from ..services.scheduler import llm_work
+from ..services.single_flight import payload_key, single_flight
+from ..services.write_queue import WriteOp, write_queue
+from ..utils.sse import sse_event, sse_response
 
 
 router = APIRouter(prefix="/sections", tags=["sections"])
 
 
-def _load_section(session: Session, section_id: int, user: User) -> tuple[DocumentSection, Project]:
-    section = session.get(DocumentSection, section_id)
+async def _load_section(session: AsyncSession, section_id: int, user: User) -> tuple[DocumentSection, Project]:
+    section = await session.get(DocumentSection, section_id)
     if not section:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Section not found")
-    project = session.get(Project, section.project_id)
+    project = await session.get(Project, section.project_id)
     if not project or project.owner_id != user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Section not found")
     return section, project
 
 
+def _store_refinement(section_id: int, prompt: str, completion: Completion) -> WriteOp[DocumentSection]:
+    def apply(session: Session) -> DocumentSection:
+        section = session.get(DocumentSection, section_id)
+        section.content = completion.text
+        section.updated_at = datetime.utcnow()
+        session.add(section)
+        session.add(
+            Revision(
+                section_id=section.id,
+                prompt=prompt,
+                response=completion.text,
+                prompt_tokens=completion.prompt_tokens,
+                completion_tokens=completion.completion_tokens,
+            )
+        )
+        return section
+
+    return apply
+
+
+@router.get("/{section_id}", response_model=SectionRead)
+async def get_section(
+    section_id: int,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> DocumentSection:
+    section, _ = await _load_section(session, section_id, current_user)
+    return section
+
+
 @router.post("/{section_id}/refine", response_model=SectionRead)
-def refine_section(
+async def refine_section(
     section_id: int,
     payload: RefineRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> SectionRead:
-    section, project = _load_section(session, section_id, current_user)
-    updated_text = llm_service.refine_section(project.topic, section.title, section.content, payload.prompt)
-    section.content = updated_text
-    section.updated_at = datetime.utcnow()
-    session.add(section)
-    session.add(
-        Revision(
-            section_id=section.id,
-            prompt=payload.prompt,
-            response=updated_text,
+    section, project = await _load_section(session, section_id, current_user)
+    topic, title, content = project.topic, section.title, section.content
+
+    async def refine() -> SectionRead:
+        completion = await llm_service.arefine_section(topic, title, content, payload.prompt, payload.mode)
+        return SectionRead.model_validate(
+            await write_queue.run(_store_refinement(section_id, payload.prompt, completion))
         )
-    )
-    session.commit()
-    session.refresh(section)
-    return SectionRead.model_validate(section)
+
+    key = payload_key(payload.prompt, payload.mode, section.updated_at)
+    with llm_work(current_user.id):
+        return await single_flight.run("refine", (section_id, key), refine)
+
+
+@router.post("/{section_id}/refine/stream")
+async def refine_section_stream(
+    section_id: int,
+    payload: RefineRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> StreamingResponse:
+    section, project = await _load_section(session, section_id, current_user)
+    plan = llm_service.plan_refinement(section.content, payload.prompt, payload.mode)
+    prompt = llm_service.refine_prompt(project.topic, section.title, plan, payload.prompt)
+    chunks_source = llm_service.astream_refine(prompt)
+    user_id = current_user.id
+
+    async def events() -> AsyncIterator[str]:
+        chunks = []
+        try:
+            with llm_work(user_id):
+                async for chunk in chunks_source:
+                    chunks.append(chunk)
+                    yield sse_event("chunk", {"section_id": section_id, "text": chunk})
+            revised = "".join(chunks)
+            completion = llm_service.completion(prompt, revised)._replace(text=plan.splice(revised))
+            stored = await write_queue.run(_store_refinement(section_id, payload.prompt, completion))
+            result = SectionRead.model_validate(stored)
+            yield sse_event("done", result.model_dump(mode="json"))
+        except Exception as exc:
+            yield sse_event("error", {"detail": str(exc) or "Refinement failed"})
+
+    return sse_response(events())
 
 
 @router.post("/{section_id}/feedback", response_model=SectionRead)
-def set_feedback(
+async def set_feedback(
     section_id: int,
     payload: FeedbackRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> SectionRead:
-    section, _ = _load_section(session, section_id, current_user)
-    section.feedback = payload.value
-    section.updated_at = datetime.utcnow()
-    session.add(section)
-    session.add(Revision(section_id=section.id, feedback=payload.value))
-    session.commit()
-    session.refresh(section)
-    return SectionRead.model_validate(section)
+    section, _ = await _load_section(session, section_id, current_user)
+
+    def apply(write_session: Session) -> DocumentSection:
+        stored = write_session.get(DocumentSection, section.id)
+        stored.feedback = payload.value
+        stored.updated_at = datetime.utcnow()
+        write_session.add(stored)
+        write_session.add(Revision(section_id=stored.id, feedback=payload.value))
+        return stored
+
+    return SectionRead.model_validate(await write_queue.run(apply))
 
 
 @router.post("/{section_id}/comment", response_model=SectionRead)
-def add_comment(
+async def add_comment(
     section_id: int,
     payload: CommentRequest,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> SectionRead:
-    section, _ = _load_section(session, section_id, current_user)
-    section.last_comment = payload.comment
-    section.updated_at = datetime.utcnow()
-    session.add(section)
-    session.add(Revision(section_id=section.id, comment=payload.comment))
-    session.commit()
-    session.refresh(section)
-    return SectionRead.model_validate(section)
+    section, _ = await _load_section(session, section_id, current_user)
+
+    def apply(write_session: Session) -> DocumentSection:
+        stored = write_session.get(DocumentSection, section.id)
+        stored.last_comment = payload.comment
+        stored.updated_at = datetime.utcnow()
+        write_session.add(stored)
+        write_session.add(Revision(section_id=stored.id, comment=payload.comment))
+        return stored
 
+    return SectionRead.model_validate(await write_queue.run(apply))
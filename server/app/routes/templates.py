@@ -1,16 +1,27 @@
+import asyncio
+
 from fastapi import APIRouter, Depends
 
 from ..auth import get_current_user
 from ..models import User
 from ..schemas import TemplateRequest, TemplateResponse
 from ..services.llm import llm_service
+from ..services.scheduler import llm_work
+from ..services.single_flight import payload_key, single_flight
 
 
 router = APIRouter(prefix="/templates", tags=["templates"])
 
 
 @router.post("/outline", response_model=TemplateResponse)
-def suggest_outline(payload: TemplateRequest, current_user: User = Depends(get_current_user)) -> TemplateResponse:
-    titles = llm_service.generate_outline(payload.topic, payload.doc_type, payload.item_count)
-    return TemplateResponse(titles=titles)
+async def suggest_outline(payload: TemplateRequest, current_user: User = Depends(get_current_user)) -> TemplateResponse:
+    async def outline() -> TemplateResponse:
+        titles = await asyncio.to_thread(
+            llm_service.generate_outline, payload.topic, payload.doc_type, payload.item_count
+        )
+        return TemplateResponse(titles=titles)
 
+    # Scoped to the user: the shared call is admitted against, and charged to, the first caller.
+    key = (current_user.id, payload_key(payload.topic, payload.doc_type, payload.item_count))
+    with llm_work(current_user.id):
+        return await single_flight.run("outline", key, outline)
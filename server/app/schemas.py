@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, EmailStr, Field
 
-from .models import DocType, FeedbackChoice, ProjectStatus
+from .models import DocType, FeedbackChoice, JobStatus, ProjectStatus, RefineMode
 
 
 class Token(BaseModel):
@@ -33,6 +33,14 @@ class UserRead(BaseModel):
         from_attributes = True
 
 
+class UsageRead(BaseModel):
+    day: date
+    requests: int
+    tokens: int
+    request_limit: int = Field(description="Daily model requests allowed; 0 means unlimited")
+    token_limit: int = Field(description="Daily prompt + completion tokens allowed; 0 means unlimited")
+
+
 class SectionConfig(BaseModel):
     title: str
     position: int
@@ -51,6 +59,7 @@ class ProjectRead(BaseModel):
     topic: str
     doc_type: DocType
     status: ProjectStatus
+    version: int
     created_at: datetime
     updated_at: datetime
 
@@ -65,6 +74,7 @@ class SectionRead(BaseModel):
     content: str
     feedback: Optional[FeedbackChoice]
     last_comment: Optional[str]
+    version: int
     created_at: datetime
     updated_at: datetime
 
@@ -76,12 +86,100 @@ class ProjectDetail(ProjectRead):
     sections: List[SectionRead]
 
 
+class SectionSummary(BaseModel):
+    id: int
+    title: str
+    position: int
+    preview: str = Field(description="Leading characters of the content; fetch `/sections/{id}` for the full text")
+    content_length: int
+    content_hash: str = Field(description="SHA-256 of the content, for comparing against a cached copy")
+    feedback: Optional[FeedbackChoice]
+    last_comment: Optional[str]
+    version: int
+    created_at: datetime
+    updated_at: datetime
+
+
+class ProjectSummary(ProjectRead):
+    sections: List[SectionSummary]
+
+
+class ProjectChanges(ProjectRead):
+    since: int
+    sections: List[SectionRead] = Field(description="Sections changed after `since`, in position order")
+
+
+class SearchHit(BaseModel):
+    kind: Literal["project", "section"]
+    project_id: int
+    project_title: str
+    section_id: Optional[int]
+    title: str
+    snippet: str = Field(description="Matching excerpt with matched terms wrapped in <mark></mark>")
+    score: float
+
+
 class GenerateRequest(BaseModel):
     regenerate: bool = False
 
 
+class JobSectionProgress(BaseModel):
+    section_id: int
+    status: str
+
+
+class JobRead(BaseModel):
+    id: int
+    project_id: int
+    kind: str
+    status: JobStatus
+    total_sections: int
+    completed_sections: int
+    attempts: int
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    sections: List[JobSectionProgress]
+
+
+class ExportArtifactRead(BaseModel):
+    id: int
+    project_id: int
+    format: DocType
+    status: JobStatus
+    size: Optional[int]
+    error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+class BulkExportRequest(BaseModel):
+    project_ids: List[int] = Field(..., min_length=1, max_length=100)
+    formats: List[DocType] = Field(..., min_length=1)
+    template: Optional[str] = None
+
+
+class ExportTemplateRead(BaseModel):
+    name: str
+    format: DocType
+
+
 class RefineRequest(BaseModel):
     prompt: str = Field(..., min_length=1, max_length=1000, description="Refinement instruction for the section")
+    mode: RefineMode = Field(
+        default=RefineMode.full,
+        description="`incremental` sends only the targeted paragraphs and a summary of the rest to the model",
+    )
+
+
+class ProjectRefineRequest(RefineRequest):
+    section_ids: Optional[List[int]] = Field(
+        default=None, min_length=1, description="Sections to refine; defaults to every section with content"
+    )
 
 
 class FeedbackRequest(BaseModel):
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional
+
+from ..config import get_settings
+from ..models import DocType, DocumentSection, Project
+
+
+settings = get_settings()
+
+
+def content_version(project: Project, sections: Iterable[DocumentSection]) -> str:
+    digest = hashlib.sha256(f"{project.id}:{project.updated_at.isoformat()}".encode("utf-8"))
+    for section in sections:
+        digest.update(f"|{section.id}:{section.updated_at.isoformat()}".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def cache_prefix(project_id: int, format: DocType, template: str) -> str:
+    return f"{project_id}-{format.value}-{template}-"
+
+
+class ExportCache:
+    """Rendered exports on disk, evicted least-recently-used once `max_bytes` is exceeded."""
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for path in sorted(self.directory.glob("*.bin"), key=lambda item: item.stat().st_mtime):
+                self._entries[path.stem] = path.stat().st_size
+                self._size += self._entries[path.stem]
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.bin"
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """The cached file opened for reading, or None on a miss.
+
+        The file is opened under the lock, so eviction by another request can unlink it but
+        cannot take it away from a reader that already holds the handle.
+        """
+        with self._lock:
+            if key in self._entries:
+                path = self._path(key)
+                try:
+                    handle = path.open("rb")
+                except FileNotFoundError:
+                    self._size -= self._entries.pop(key)
+                else:
+                    self._entries.move_to_end(key)
+                    os.utime(path)
+                    self.hits += 1
+                    return handle
+            self.misses += 1
+            return None
+
+    def put(self, key: str, data: bytes, replaces_prefix: Optional[str] = None) -> Path:
+        path = self._path(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            if replaces_prefix:
+                for stale in [item for item in self._entries if item.startswith(replaces_prefix) and item != key]:
+                    self._discard(stale)
+            self._size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                self._discard(next(iter(self._entries)))
+        return path
+
+    def _discard(self, key: str) -> None:
+        self._size -= self._entries.pop(key)
+        self._path(key).unlink(missing_ok=True)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._size}
+
+
+export_cache = ExportCache(settings.export_cache_dir, settings.export_cache_max_bytes)
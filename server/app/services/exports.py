@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Set, Tuple
+
+from sqlalchemy import and_, func, or_, update
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..config import get_settings
+from ..database import async_engine, engine
+from ..models import DocType, DocumentSection, ExportArtifact, JobStatus, Project
+from ..utils.ooxml_stream import ZipStream
+from .export_cache import cache_prefix, content_version, export_cache
+from .renderer import DocumentRenderer
+
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+renderer = DocumentRenderer(settings.export_workers)
+_tasks: Set[asyncio.Task] = set()
+_UNSAFE_FILENAME = re.compile(r"[^\w\- ]+")
+
+
+def artifact_path(artifact: ExportArtifact) -> Path:
+    return Path(settings.export_artifact_dir) / f"{artifact.id}.{artifact.format.value}"
+
+
+async def enqueue_export(
+    session: AsyncSession, project: Project, sections: List[DocumentSection], format: DocType, template: str
+) -> ExportArtifact:
+    artifact = ExportArtifact(
+        project_id=project.id,
+        owner_id=project.owner_id,
+        format=format,
+        template=template,
+        content_version=content_version(project, sections),
+        heartbeat_at=datetime.utcnow(),
+    )
+    session.add(artifact)
+    await session.commit()
+    await session.refresh(artifact)
+
+    task = asyncio.create_task(_render_artifact(artifact.id, project, sections))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return artifact
+
+
+async def _render_artifact(artifact_id: int, project: Project, sections: List[DocumentSection]) -> None:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        artifact = await session.get(ExportArtifact, artifact_id)
+        artifact.status = JobStatus.running
+        artifact.heartbeat_at = datetime.utcnow()
+        session.add(artifact)
+        await session.commit()
+
+        path = artifact_path(artifact)
+        heartbeat = asyncio.ensure_future(_beat(artifact_id))
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            artifact.size = await renderer.render(
+                project, sections, artifact.format, artifact.template, str(path)
+            )
+            artifact.path = str(path)
+            artifact.status = JobStatus.succeeded
+        except Exception as exc:
+            logger.exception("Export %s failed", artifact_id)
+            artifact.status = JobStatus.failed
+            artifact.error = str(exc) or exc.__class__.__name__
+        finally:
+            heartbeat.cancel()
+        artifact.finished_at = datetime.utcnow()
+        session.add(artifact)
+        await session.commit()
+    await asyncio.to_thread(purge_expired_artifacts)
+
+
+async def _beat(artifact_id: int) -> None:
+    while True:
+        await asyncio.sleep(settings.job_heartbeat_interval)
+        await asyncio.to_thread(_heartbeat, artifact_id)
+
+
+def _heartbeat(artifact_id: int) -> None:
+    with Session(engine) as session:
+        session.exec(
+            update(ExportArtifact).where(ExportArtifact.id == artifact_id).values(heartbeat_at=datetime.utcnow())
+        )
+        session.commit()
+
+
+def is_stale(artifact: ExportArtifact) -> bool:
+    """Whether an unfinished artifact has stopped heartbeating, i.e. the process rendering it is gone."""
+    last_seen = artifact.heartbeat_at or artifact.created_at
+    return artifact.status in (JobStatus.queued, JobStatus.running) and last_seen < _stale_before()
+
+
+def _stale_before() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=settings.job_stale_after)
+
+
+def iter_project_sections(project_id: int, chunk_size: int) -> Iterator[DocumentSection]:
+    """Yield sections in position order, reading `chunk_size` rows per query with a keyset cursor."""
+    cursor = None
+    while True:
+        statement = select(DocumentSection).where(DocumentSection.project_id == project_id)
+        if cursor is not None:
+            position, section_id = cursor
+            statement = statement.where(
+                or_(
+                    DocumentSection.position > position,
+                    and_(DocumentSection.position == position, DocumentSection.id > section_id),
+                )
+            )
+        with Session(engine) as session:
+            chunk = session.exec(
+                statement.order_by(DocumentSection.position, DocumentSection.id).limit(chunk_size)
+            ).all()
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        cursor = (chunk[-1].position, chunk[-1].id)
+
+
+async def _bulk_member(
+    project: Project, sections: List[DocumentSection], format: DocType, template: str
+) -> Tuple[str, bytes]:
+    name = f"{project.id}-{_UNSAFE_FILENAME.sub('_', project.title).strip() or 'project'}.{format.value}"
+    prefix = cache_prefix(project.id, format, template)
+    version = content_version(project, sections)
+    if export_cache.enabled:
+        handle = export_cache.open(prefix + version)
+        if handle is not None:
+            with handle:
+                return name, await asyncio.to_thread(handle.read)
+    try:
+        data = await renderer.render_bytes(project, sections, format, template)
+    except Exception as exc:
+        logger.exception("Bulk export of project %s as %s failed", project.id, format.value)
+        return f"{name}.error.txt", f"Export failed: {exc}".encode("utf-8")
+    if export_cache.enabled:
+        await asyncio.to_thread(export_cache.put, prefix + version, data, prefix)
+    return name, data
+
+
+async def stream_bulk_export(
+    projects: List[Project],
+    sections: Dict[int, List[DocumentSection]],
+    templates: Dict[DocType, str],
+) -> AsyncIterator[bytes]:
+    """Yield a zip of every project in every format, adding members in the order they finish.
+
+    At most twice as many renders as pool workers are in flight, so finished documents wait
+    to be sent rather than piling up in memory.
+    """
+    archive = ZipStream()
+    work = iter([(project, format) for project in projects for format in templates])
+    pending: Set[asyncio.Task] = set()
+
+    def start_next() -> None:
+        item = next(work, None)
+        if item is not None:
+            project, format = item
+            member = _bulk_member(project, sections.get(project.id, []), format, templates[format])
+            pending.add(asyncio.create_task(member))
+
+    for _ in range(max(1, settings.export_workers) * 2):
+        start_next()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                name, data = task.result()
+                yield archive.add(name, data)
+                start_next()
+        yield archive.close()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def recover_artifacts() -> None:
+    """Fail exports whose rendering process stopped heartbeating.
+
+    Artifacts another live process is still rendering keep beating and are left alone.
+    """
+    with Session(engine) as session:
+        interrupted = session.exec(
+            select(ExportArtifact).where(
+                ExportArtifact.status.in_((JobStatus.queued, JobStatus.running)),
+                func.coalesce(ExportArtifact.heartbeat_at, ExportArtifact.created_at) < _stale_before(),
+            )
+        ).all()
+        for artifact in interrupted:
+            artifact.status = JobStatus.failed
+            artifact.error = "Export stopped responding"
+            artifact.finished_at = datetime.utcnow()
+            session.add(artifact)
+        session.commit()
+
+
+def purge_expired_artifacts() -> None:
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.export_artifact_ttl)
+    with Session(engine) as session:
+        expired = session.exec(select(ExportArtifact).where(ExportArtifact.created_at < cutoff)).all()
+        for artifact in expired:
+            if artifact.path:
+                Path(artifact.path).unlink(missing_ok=True)
+            session.delete(artifact)
+        session.commit()
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..config import get_settings
+from ..database import engine
+from ..models import DocumentSection, Job, JobStatus, Project, ProjectStatus, Revision
+from .llm import llm_service
+from .scheduler import LLMPriority, QuotaExceeded, llm_work
+
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ACTIVE_JOB_STATUSES = (JobStatus.queued, JobStatus.running)
+# Generation streamed to a client by the request itself; tracked like a job but never claimed by a worker.
+STREAM_JOB_KIND = "generate_stream"
+
+
+async def enqueue_generation(
+    session: AsyncSession, project: Project, sections: List[DocumentSection], regenerate: bool
+) -> Job:
+    pending = [section for section in sections if not section.content or regenerate]
+    job = Job(
+        project_id=project.id,
+        owner_id=project.owner_id,
+        regenerate=regenerate,
+        total_sections=len(pending),
+        progress={str(section.id): "pending" for section in pending},
+    )
+    project.status = ProjectStatus.generating
+    session.add(project)
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
+async def start_stream_job(session: AsyncSession, project: Project, section_ids: List[int], regenerate: bool) -> Job:
+    """Record generation streamed by the request itself as a running job, so recovery and conflict checks see it."""
+    now = datetime.utcnow()
+    job = Job(
+        project_id=project.id,
+        owner_id=project.owner_id,
+        kind=STREAM_JOB_KIND,
+        status=JobStatus.running,
+        regenerate=regenerate,
+        total_sections=len(section_ids),
+        progress={str(section_id): "pending" for section_id in section_ids},
+        attempts=1,
+        started_at=now,
+        heartbeat_at=now,
+    )
+    project.status = ProjectStatus.generating
+    session.add(project)
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
+async def keep_stream_job_alive(job_id: int) -> None:
+    """Heartbeat a stream job until cancelled."""
+    while True:
+        await asyncio.sleep(settings.job_heartbeat_interval)
+        await asyncio.to_thread(_heartbeat, job_id)
+
+
+async def finish_stream_job(session: AsyncSession, job_id: int, error: Optional[str] = None) -> None:
+    """Mark a stream job succeeded, or failed with `error` and its project settled; the caller commits."""
+    job = await session.get(Job, job_id)
+    job.finished_at = datetime.utcnow()
+    if error is None:
+        job.status = JobStatus.succeeded
+        job.progress = {key: "done" for key in job.progress}
+        job.completed_sections = len(job.progress)
+    else:
+        job.status = JobStatus.failed
+        job.error = error
+        project = await session.get(Project, job.project_id)
+        project.status = await _settled_status_async(session, project.id)
+        session.add(project)
+    session.add(job)
+
+
+async def active_generation(session: AsyncSession, project_id: int) -> Optional[Job]:
+    result = await session.exec(
+        select(Job)
+        .where(Job.project_id == project_id, Job.status.in_(ACTIVE_JOB_STATUSES))
+        .order_by(Job.id.desc())
+    )
+    return result.first()
+
+
+def _status_for(sections: List[DocumentSection]) -> ProjectStatus:
+    if sections and all(section.content for section in sections):
+        return ProjectStatus.ready
+    return ProjectStatus.draft
+
+
+def _settled_status(session: Session, project_id: int) -> ProjectStatus:
+    return _status_for(session.exec(select(DocumentSection).where(DocumentSection.project_id == project_id)).all())
+
+
+async def _settled_status_async(session: AsyncSession, project_id: int) -> ProjectStatus:
+    result = await session.exec(select(DocumentSection).where(DocumentSection.project_id == project_id))
+    return _status_for(result.all())
+
+
+def recover_jobs() -> None:
+    """Requeue jobs abandoned by a crashed worker and settle orphaned `generating` projects."""
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.job_stale_after)
+    with Session(engine) as session:
+        stale = session.exec(
+            select(Job).where(Job.status == JobStatus.running, Job.heartbeat_at < stale_before)
+        ).all()
+        for job in stale:
+            if job.kind != STREAM_JOB_KIND and job.attempts < settings.job_max_attempts:
+                logger.warning("Requeueing stale job %s (attempt %s)", job.id, job.attempts)
+                job.status = JobStatus.queued
+                job.completed_sections = 0
+                job.progress = {key: "pending" for key in job.progress}
+            else:
+                job.status = JobStatus.failed
+                job.error = "Stream stopped responding" if job.kind == STREAM_JOB_KIND else "Worker stopped responding"
+                job.finished_at = datetime.utcnow()
+            session.add(job)
+        session.commit()
+
+        active_projects = select(Job.project_id).where(Job.status.in_(ACTIVE_JOB_STATUSES))
+        orphaned = session.exec(
+            select(Project).where(Project.status == ProjectStatus.generating, Project.id.not_in(active_projects))
+        ).all()
+        for project in orphaned:
+            project.status = _settled_status(session, project.id)
+            session.add(project)
+        session.commit()
+
+
+def claim_next_job() -> Optional[int]:
+    with Session(engine) as session:
+        candidates = session.exec(
+            select(Job.id).where(Job.status == JobStatus.queued).order_by(Job.id).limit(5)
+        ).all()
+        for job_id in candidates:
+            now = datetime.utcnow()
+            result = session.exec(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JobStatus.queued)
+                .values(status=JobStatus.running, started_at=now, heartbeat_at=now, attempts=Job.attempts + 1)
+            )
+            session.commit()
+            if result.rowcount == 1:
+                return job_id
+    return None
+
+
+def _heartbeat(job_id: int) -> None:
+    with Session(engine) as session:
+        session.exec(update(Job).where(Job.id == job_id).values(heartbeat_at=datetime.utcnow()))
+        session.commit()
+
+
+def run_job(job_id: int) -> None:
+    done = threading.Event()
+    progress_lock = threading.Lock()
+
+    def beat() -> None:
+        while not done.wait(settings.job_heartbeat_interval):
+            _heartbeat(job_id)
+
+    threading.Thread(target=beat, name=f"job-{job_id}-heartbeat", daemon=True).start()
+    try:
+        with Session(engine) as session:
+            job = session.get(Job, job_id)
+            project = session.get(Project, job.project_id)
+            section_ids = [int(key) for key in job.progress]
+            sections = session.exec(
+                select(DocumentSection)
+                .where(DocumentSection.id.in_(section_ids))
+                .order_by(DocumentSection.position)
+            ).all()
+
+            def mark_done(index: int, _content: str) -> None:
+                with progress_lock, Session(engine) as progress_session:
+                    tracked = progress_session.get(Job, job_id)
+                    tracked.progress = {**tracked.progress, str(sections[index].id): "done"}
+                    tracked.completed_sections += 1
+                    tracked.heartbeat_at = datetime.utcnow()
+                    progress_session.add(tracked)
+                    progress_session.commit()
+
+            with llm_work(job.owner_id, LLMPriority.bulk):
+                completions = llm_service.generate_sections(
+                    project.topic,
+                    [section.title for section in sections],
+                    on_complete=mark_done,
+                    use_cache=not job.regenerate,
+                )
+            now = datetime.utcnow()
+            for section, completion in zip(sections, completions):
+                section.content = completion.text
+                section.updated_at = now
+                session.add(section)
+                session.add(
+                    Revision(
+                        section_id=section.id,
+                        prompt="initial generation" if not job.regenerate else "regeneration",
+                        response=completion.text,
+                        prompt_tokens=completion.prompt_tokens,
+                        completion_tokens=completion.completion_tokens,
+                    )
+                )
+            session.refresh(job)
+            job.status = JobStatus.succeeded
+            job.finished_at = now
+            project.status = ProjectStatus.ready
+            project.updated_at = now
+            session.add(job)
+            session.add(project)
+            session.commit()
+    except Exception as exc:
+        logger.exception("Generation job %s failed", job_id)
+        _fail_job(job_id, str(exc), retry=not isinstance(exc, QuotaExceeded))
+    finally:
+        done.set()
+
+
+def _fail_job(job_id: int, error: str, retry: bool = True) -> None:
+    with Session(engine) as session:
+        job = session.get(Job, job_id)
+        if job is None:
+            return
+        if retry and job.attempts < settings.job_max_attempts:
+            job.status = JobStatus.queued
+            job.completed_sections = 0
+            job.progress = {key: "pending" for key in job.progress}
+        else:
+            job.status = JobStatus.failed
+            job.error = error
+            job.finished_at = datetime.utcnow()
+            project = session.get(Project, job.project_id)
+            if project:
+                project.status = _settled_status(session, project.id)
+                session.add(project)
+        session.add(job)
+        session.commit()
+
+
+class JobWorker:
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        recover_jobs()
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def _loop(self) -> None:
+        last_recovery = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                job_id = claim_next_job()
+            except Exception:
+                logger.exception("Could not claim a job")
+                job_id = None
+            if job_id is None:
+                if self._stop.wait(settings.job_poll_interval):
+                    break
+                if time.monotonic() - last_recovery >= settings.job_stale_after / 2:
+                    last_recovery = time.monotonic()
+                    try:
+                        recover_jobs()
+                    except Exception:
+                        logger.exception("Job recovery failed")
+                continue
+            run_job(job_id)
+
+
+job_worker = JobWorker(settings.job_workers)
@@ -1,43 +1,255 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import hashlib
+import logging
 import random
-from typing import List
-
-try:
-    import google.generativeai as genai
-    from google.api_core import exceptions as google_exceptions
-except ImportError:
-    genai = None
-    google_exceptions = None
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 from ..config import get_settings
-from ..models import DocType
+from ..models import DocType, RefineMode
+from .llm_client import CircuitBreaker, CircuitOpenError, LLMClient
+from .metrics import metrics
+from .prompts import Prompt, PromptBuilder, PromptTooLarge, Slot, TokenBudget, get_tokenizer
+from .providers import LLMProvider, get_provider
+from .refine import RefinePlan, build_refine_plan
+from .scheduler import QuotaExceeded, llm_scheduler
 
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
+class Completion(NamedTuple):
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class ResponseCache:
+    """Two-tier (in-process LRU, optional SQLite) cache of model responses keyed by model and prompt."""
+
+    def __init__(self, max_entries: int, sqlite_path: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            self._disk = sqlite3.connect(sqlite_path, check_same_thread=False, isolation_level=None)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._disk is not None
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str) -> str:
+        normalized = " ".join(prompt.split())
+        return hashlib.sha256(f"{model_name}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+                if row:
+                    self._disk.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "entries": len(self._entries),
+            }
+
+
 class LLMService:
     def __init__(self) -> None:
-        self.api_key = settings.gemini_api_key
-        self.model = None
+        self.provider: Optional[LLMProvider] = get_provider(settings)
+        self.model_name = self.provider.model_name if self.provider else "fallback"
+        self.client: Optional[LLMClient] = None
         self.use_api = False
-        if self.api_key and genai:
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel("gemini-1.5-flash")
-                self.use_api = True
-            except Exception:
-                self.use_api = False
-
-    def _call_model(self, prompt: str) -> str:
-        if self.model and self.use_api:
-            try:
-                response = self.model.generate_content(prompt)
-                return response.text.strip()
-            except Exception:
-                pass
-        return self._generate_fallback_content(prompt)
+        self.cache = ResponseCache(settings.llm_cache_size, settings.llm_cache_path)
+        self.cache_ttls = {
+            "outline": settings.llm_cache_ttl_outline,
+            "section": settings.llm_cache_ttl_section,
+            "refine": settings.llm_cache_ttl_refine,
+        }
+        self.prompts = PromptBuilder(
+            get_tokenizer(settings.llm_tokenizer),
+            {
+                "outline": TokenBudget(settings.llm_input_tokens_outline, settings.llm_output_tokens_outline),
+                "section": TokenBudget(settings.llm_input_tokens_section, settings.llm_output_tokens_section),
+                "refine": TokenBudget(settings.llm_input_tokens_refine, settings.llm_output_tokens_refine),
+            },
+        )
+        if self.provider:
+            self.client = self._build_client(self.provider)
+            self.use_api = True
+
+    def _build_client(self, provider: LLMProvider) -> LLMClient:
+        return LLMClient(
+            provider.complete,
+            provider.stream,
+            timeout=settings.llm_timeout,
+            deadline=settings.llm_deadline,
+            max_retries=settings.llm_max_retries,
+            retry_base_delay=settings.llm_retry_base_delay,
+            retry_max_delay=settings.llm_retry_max_delay,
+            hedge_after=settings.llm_hedge_after,
+            breaker=CircuitBreaker(
+                window=settings.llm_breaker_window,
+                failure_rate=settings.llm_breaker_failure_rate,
+                min_calls=settings.llm_breaker_min_calls,
+                reset_after=settings.llm_breaker_reset_after,
+            ),
+            retryable=provider.retryable,
+        )
+
+    def _record_fallback(self, exc: Exception) -> None:
+        if isinstance(exc, CircuitOpenError):
+            metrics.incr("llm.fallback.circuit_open")
+        else:
+            logger.warning("LLM call failed, serving fallback content: %r", exc)
+            metrics.incr("llm.fallback.error")
+
+    def _cache_key(self, operation: Optional[str], prompt: str) -> Optional[str]:
+        if operation is None or not self.cache.enabled or self.cache_ttls.get(operation, 0) <= 0:
+            return None
+        return self.cache.make_key(self.model_name, prompt)
+
+    def _lookup(self, operation: Optional[str], prompt: str, use_cache: bool) -> Tuple[Optional[str], Optional[str]]:
+        key = self._cache_key(operation, prompt)
+        cached = self.cache.get(key) if key and use_cache else None
+        return key, cached
+
+    def _store(self, key: Optional[str], operation: Optional[str], text: str) -> None:
+        if key:
+            self.cache.set(key, text, self.cache_ttls[operation])
+
+    def _call_model(self, prompt: Prompt, operation: Optional[str] = None, use_cache: bool = True) -> str:
+        if self.client and self.use_api:
+            key, cached = self._lookup(operation, prompt.text, use_cache)
+            if cached is not None:
+                return cached
+            with llm_scheduler.slot(prompt.tokens) as grant:
+                try:
+                    text = self.client.complete(prompt.text, prompt.max_output_tokens)
+                except Exception as exc:
+                    self._record_fallback(exc)
+                else:
+                    grant.record(prompt.tokens + self.prompts.count(text))
+                    self._store(key, operation, text)
+                    return text
+        return self._generate_fallback_content(prompt.text)
+
+    async def _acall_model(self, prompt: Prompt, operation: Optional[str] = None, use_cache: bool = True) -> str:
+        if self.client and self.use_api:
+            key, cached = self._lookup(operation, prompt.text, use_cache)
+            if cached is not None:
+                return cached
+            async with llm_scheduler.aslot(prompt.tokens) as grant:
+                try:
+                    text = await self.client.acomplete(prompt.text, prompt.max_output_tokens)
+                except Exception as exc:
+                    self._record_fallback(exc)
+                else:
+                    grant.record(prompt.tokens + self.prompts.count(text))
+                    self._store(key, operation, text)
+                    return text
+        return self._generate_fallback_content(prompt.text)
+
+    async def _astream_model(
+        self, prompt: Prompt, operation: Optional[str] = None, use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        if self.client and self.use_api:
+            key, cached = self._lookup(operation, prompt.text, use_cache)
+            if cached is not None:
+                yield cached
+                return
+            chunks: List[str] = []
+            async with llm_scheduler.aslot(prompt.tokens) as grant:
+                try:
+                    async for chunk in self.client.astream(prompt.text, prompt.max_output_tokens):
+                        chunks.append(chunk)
+                        yield chunk
+                except Exception as exc:
+                    if chunks:
+                        raise
+                    self._record_fallback(exc)
+                else:
+                    self._store(key, operation, "".join(chunks).strip())
+                    return
+                finally:
+                    # Fallback text is free; a stream that produced anything was billed by the provider.
+                    if chunks:
+                        grant.record(prompt.tokens + self.prompts.count("".join(chunks)))
+        for chunk in self._stream_fallback_content(prompt.text):
+            yield chunk
+            await asyncio.sleep(0)
+
+    def _stream_fallback_content(self, prompt: str, words_per_chunk: int = 8) -> Iterator[str]:
+        words = self._generate_fallback_content(prompt).split(" ")
+        for start in range(0, len(words), words_per_chunk):
+            chunk = " ".join(words[start : start + words_per_chunk])
+            yield chunk if start + words_per_chunk >= len(words) else chunk + " "
 
     def _generate_fallback_content(self, prompt: str) -> str:
         topic_keywords = self._extract_topic_keywords(prompt)
@@ -168,16 +380,20 @@ class LLMService:
                     titles.append(f"{topic} - Section {i + 1}")
             return titles
 
-        prompt = (
+        prompt = self.prompts.build(
+            "outline",
             f"Create {item_count} concise headings for a {doc_type.value.upper()} document "
-            f"about {topic}. Provide only the headings separated by newline."
+            "about {topic}. Provide only the headings separated by newline.",
+            [Slot("topic", topic)],
         )
         try:
-            raw = self._call_model(prompt)
+            raw = self._call_model(prompt, operation="outline")
             if raw and len(raw) > 20:
                 titles = [line.strip("- ").strip() for line in raw.splitlines() if line.strip() and len(line.strip()) > 3]
                 if len(titles) >= item_count:
                     return titles[:item_count]
+        except QuotaExceeded:
+            raise
         except Exception:
             pass
 
@@ -201,23 +417,128 @@ class LLMService:
                 titles.append(f"{topic} - Section {i + 1}")
         return titles
 
-    def generate_section(self, topic: str, section_title: str) -> str:
-        prompt = (
-            f"Write a comprehensive, detailed business-ready section (at least 300 words) for the document titled "
-            f"'{topic}'. Focus specifically on the section heading '{section_title}'. "
-            f"Use professional tone, include relevant details, examples, and actionable insights. "
-            f"Make the content substantial and informative."
+    def section_prompt(self, topic: str, section_title: str) -> Prompt:
+        return self.prompts.build(
+            "section",
+            "Write a comprehensive, detailed business-ready section (at least 300 words) for the document titled "
+            "'{topic}'. Focus specifically on the section heading '{title}'. "
+            "Use professional tone, include relevant details, examples, and actionable insights. "
+            "Make the content substantial and informative.",
+            [Slot("topic", topic), Slot("title", section_title)],
         )
-        return self._call_model(prompt)
 
-    def refine_section(self, topic: str, section_title: str, current_text: str, refinement_prompt: str) -> str:
-        prompt = (
-            f"You are improving a section named '{section_title}' in a document about {topic}. "
-            f"Current text:\n{current_text}\n\nApply this instruction: {refinement_prompt}. "
-            "Return the updated section text only."
+    def refine_prompt(self, topic: str, section_title: str, plan: RefinePlan, refinement_prompt: str) -> Prompt:
+        """The text being revised is never cut, since the answer replaces it; the surrounding context is."""
+        passage_tokens = self.prompts.count(plan.passage)
+        output_budget = self.prompts.budgets["refine"].output
+        if passage_tokens > output_budget:
+            raise PromptTooLarge(
+                f"The text to refine is about {passage_tokens} tokens but a revision may only be {output_budget}; "
+                "refine it in smaller parts"
+            )
+        instruction = Slot("instruction", refinement_prompt, keep=None)
+        if not plan.partial:
+            return self.prompts.build(
+                "refine",
+                "You are improving a section named '{title}' in a document about {topic}. "
+                "Current text:\n{text}\n\nApply this instruction: {instruction}. "
+                "Return the updated section text only.",
+                [Slot("topic", topic), Slot("title", section_title), Slot("text", plan.text, keep=None), instruction],
+            )
+        # Summary lines nearest the passage survive truncation longest.
+        context = [
+            (name, label, "\n".join(f"- {line}" for line in lines), keep)
+            for name, label, lines, keep in (
+                ("before", "Before the passage", plan.before, "tail"),
+                ("after", "After the passage", plan.after, "head"),
+            )
+            if lines
+        ]
+        return self.prompts.build(
+            "refine",
+            "You are improving part of a section named '{title}' in a document about {topic}. "
+            "The rest of the section is summarised below for context only; do not rewrite it.\n\n"
+            + "".join(f"{label}:\n{{{name}}}\n\n" for name, label, _, _ in context)
+            + "Passage to revise:\n{passage}\n\nApply this instruction to the passage: {instruction}. "
+            "Return the revised passage only.",
+            [Slot(name, lines, keep) for name, _, lines, keep in context]
+            + [Slot("topic", topic), Slot("title", section_title), Slot("passage", plan.passage, keep=None), instruction],
         )
-        return self._call_model(prompt)
 
+    def plan_refinement(self, current_text: str, refinement_prompt: str, mode: RefineMode) -> RefinePlan:
+        plan = build_refine_plan(current_text, refinement_prompt, mode)
+        if mode == RefineMode.incremental:
+            metrics.incr("refine.incremental" if plan.partial else "refine.incremental_fallback")
+        return plan
+
+    def completion(self, prompt: Prompt, text: str) -> Completion:
+        return Completion(text, prompt.tokens, self.prompts.count(text))
+
+    def generate_section(self, topic: str, section_title: str, use_cache: bool = True) -> Completion:
+        prompt = self.section_prompt(topic, section_title)
+        return self.completion(prompt, self._call_model(prompt, operation="section", use_cache=use_cache))
+
+    async def agenerate_section(self, topic: str, section_title: str, use_cache: bool = True) -> Completion:
+        prompt = self.section_prompt(topic, section_title)
+        return self.completion(prompt, await self._acall_model(prompt, operation="section", use_cache=use_cache))
+
+    def astream_section(self, prompt: Prompt, use_cache: bool = True) -> AsyncIterator[str]:
+        """Stream text for a prompt from `section_prompt`."""
+        return self._astream_model(prompt, operation="section", use_cache=use_cache)
+
+    def generate_sections(
+        self,
+        topic: str,
+        section_titles: List[str],
+        on_complete: Optional[Callable[[int, Completion], None]] = None,
+        use_cache: bool = True,
+    ) -> List[Completion]:
+        if not section_titles:
+            return []
+        results: List[Optional[Completion]] = [None] * len(section_titles)
+        workers = max(1, min(settings.llm_max_concurrency, len(section_titles)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-generate") as executor:
+            # Pool threads do not inherit context; carry the caller's llm_work attribution over.
+            futures = {
+                executor.submit(contextvars.copy_context().run, self.generate_section, topic, title, use_cache): index
+                for index, title in enumerate(section_titles)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                if on_complete:
+                    on_complete(index, results[index])
+        return results
+
+    def refine_section(
+        self,
+        topic: str,
+        section_title: str,
+        current_text: str,
+        refinement_prompt: str,
+        mode: RefineMode = RefineMode.full,
+    ) -> Completion:
+        plan = self.plan_refinement(current_text, refinement_prompt, mode)
+        prompt = self.refine_prompt(topic, section_title, plan, refinement_prompt)
+        revised = self._call_model(prompt, operation="refine")
+        return self.completion(prompt, revised)._replace(text=plan.splice(revised))
+
+    async def arefine_section(
+        self,
+        topic: str,
+        section_title: str,
+        current_text: str,
+        refinement_prompt: str,
+        mode: RefineMode = RefineMode.full,
+    ) -> Completion:
+        plan = self.plan_refinement(current_text, refinement_prompt, mode)
+        prompt = self.refine_prompt(topic, section_title, plan, refinement_prompt)
+        revised = await self._acall_model(prompt, operation="refine")
+        return self.completion(prompt, revised)._replace(text=plan.splice(revised))
+
+    def astream_refine(self, prompt: Prompt) -> AsyncIterator[str]:
+        """Stream the revised passage for a prompt from `refine_prompt`; callers splice it with `plan.splice`."""
+        return self._astream_model(prompt, operation="refine")
 
 llm_service = LLMService()
 
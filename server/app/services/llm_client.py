@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from enum import Enum
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple, Type
+
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# (prompt, timeout, max output tokens or None)
+CompleteFn = Callable[[str, float, Optional[int]], Awaitable[str]]
+StreamFn = Callable[[str, float, Optional[int]], AsyncIterator[str]]
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class BreakerState(str, Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+class CircuitBreaker:
+    """Error-rate breaker over a sliding window of recent calls."""
+
+    def __init__(self, window: int, failure_rate: float, min_calls: int, reset_after: float) -> None:
+        self.window = window
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_after = reset_after
+        self.state = BreakerState.closed
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == BreakerState.closed:
+                return True
+            if self.state == BreakerState.open and time.monotonic() - self._opened_at >= self.reset_after:
+                self._transition(BreakerState.half_open)
+            if self.state == BreakerState.half_open and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def abandon(self) -> None:
+        """Hand back the half-open probe slot when the probe ended without an outcome (cancelled or closed)."""
+        with self._lock:
+            if self.state == BreakerState.half_open:
+                self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._outcomes.append(True)
+            if self.state == BreakerState.half_open:
+                self._outcomes.clear()
+                self._transition(BreakerState.closed)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._outcomes.append(False)
+            if self.state == BreakerState.half_open:
+                self._trip()
+                return
+            if self.state == BreakerState.closed and len(self._outcomes) >= self.min_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._trip()
+
+    def _trip(self) -> None:
+        self._opened_at = time.monotonic()
+        self._transition(BreakerState.open)
+
+    def _transition(self, state: BreakerState) -> None:
+        if state == self.state:
+            return
+        logger.warning("LLM circuit breaker %s -> %s", self.state.value, state.value)
+        metrics.incr(f"llm.breaker.{state.value}")
+        self.state = state
+        self._probing = False
+
+
+class _BackgroundLoop:
+    """Event loop on a daemon thread so synchronous callers can share one async client."""
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-client-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+
+_background_loop = _BackgroundLoop()
+_END_OF_STREAM = object()
+
+
+class LLMClient:
+    """Wraps a provider call with per-call deadlines, jittered retries, hedging and a circuit breaker.
+
+    All provider calls run on one shared background loop so loop-bound provider clients stay
+    valid; `complete` serves threads and `acomplete`/`astream` serve any other event loop.
+    """
+
+    def __init__(
+        self,
+        complete_fn: CompleteFn,
+        stream_fn: Optional[StreamFn] = None,
+        *,
+        timeout: float,
+        deadline: float,
+        max_retries: int,
+        retry_base_delay: float,
+        retry_max_delay: float,
+        hedge_after: float,
+        breaker: CircuitBreaker,
+        retryable: Tuple[Type[BaseException], ...] = (),
+    ) -> None:
+        self.complete_fn = complete_fn
+        self.stream_fn = stream_fn
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.hedge_after = hedge_after
+        self.breaker = breaker
+        self.retryable = (asyncio.TimeoutError, ConnectionError) + tuple(retryable)
+
+    def _admit(self, cause: Optional[BaseException] = None) -> bool:
+        """Raise if the breaker rejects the call; otherwise return whether the call is the half-open probe."""
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM circuit breaker is open") from cause
+        # Calls run on the one background loop, so nothing else can be admitted in between.
+        return self.breaker.state == BreakerState.half_open
+
+    async def _complete(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        probe = self._admit()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        attempt = 0
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                try:
+                    text = await asyncio.wait_for(
+                        self._hedged(prompt, max_tokens), timeout=min(self.timeout, remaining)
+                    )
+                except Exception as exc:
+                    if isinstance(exc, asyncio.TimeoutError):
+                        metrics.incr("llm.timeout")
+                    attempt += 1
+                    remaining = deadline - loop.time()
+                    final = attempt > self.max_retries or not isinstance(exc, self.retryable) or remaining <= 0
+                    # A probe keeps its slot through its retries and reports only how it finally went.
+                    if final or not probe:
+                        self.breaker.record_failure()
+                    if final:
+                        probe = False
+                        raise
+                    delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1)))
+                    metrics.incr("llm.retry")
+                    await asyncio.sleep(min(delay, remaining))
+                    if not probe:
+                        probe = self._admit(exc)
+                    continue
+                self.breaker.record_success()
+                probe = False
+                return text
+        finally:
+            if probe:
+                self.breaker.abandon()
+
+    async def _hedged(self, prompt: str, max_tokens: Optional[int]) -> str:
+        tasks = [asyncio.ensure_future(self.complete_fn(prompt, self.timeout, max_tokens))]
+        try:
+            if self.hedge_after > 0:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+                if not done:
+                    metrics.incr("llm.hedge")
+                    tasks.append(asyncio.ensure_future(self.complete_fn(prompt, self.timeout, max_tokens)))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _stream(self, prompt: str, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        if self.stream_fn is None:
+            yield await self._complete(prompt, max_tokens)
+            return
+        probe = self._admit()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        chunks = self.stream_fn(prompt, self.timeout, max_tokens)
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError("LLM stream passed its deadline")
+                    # Every chunk, not just the first, must arrive within the per-call timeout.
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=min(self.timeout, remaining))
+                except StopAsyncIteration:
+                    break
+                except Exception as exc:
+                    self.breaker.record_failure()
+                    probe = False
+                    if isinstance(exc, asyncio.TimeoutError):
+                        metrics.incr("llm.timeout")
+                    raise
+                yield chunk
+            self.breaker.record_success()
+            probe = False
+        finally:
+            # Cancelled, or closed early by a consumer that went away: neither outcome is known.
+            if probe:
+                self.breaker.abandon()
+            await chunks.aclose()
+
+    def submit(self, prompt: str, max_tokens: Optional[int] = None) -> Future:
+        return asyncio.run_coroutine_threadsafe(self._complete(prompt, max_tokens), _background_loop.get())
+
+    def complete(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        return self.submit(prompt, max_tokens).result()
+
+    async def acomplete(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        return await asyncio.wrap_future(self.submit(prompt, max_tokens))
+
+    def _pump(self, prompt: str, max_tokens: Optional[int], put: Callable[[object], None]) -> Future:
+        async def pump() -> None:
+            try:
+                async for chunk in self._stream(prompt, max_tokens):
+                    put(chunk)
+            except BaseException as exc:
+                put(exc)
+            finally:
+                put(_END_OF_STREAM)
+
+        return asyncio.run_coroutine_threadsafe(pump(), _background_loop.get())
+
+    async def astream(self, prompt: str, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        future = self._pump(prompt, max_tokens, lambda item: loop.call_soon_threadsafe(items.put_nowait, item))
+        try:
+            while True:
+                item = await items.get()
+                if item is _END_OF_STREAM:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
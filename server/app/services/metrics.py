@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from typing import Dict
+
+
+class Metrics:
+    """Process-wide counters exposed at `/metrics`."""
+
+    def __init__(self) -> None:
+        self._counters: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, name: str) -> int:
+        with self._lock:
+            return self._counters[name]
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+
+metrics = Metrics()
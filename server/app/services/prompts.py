@@ -0,0 +1,176 @@
+"""Token-budgeted prompt construction.
+
+Prompts are templates with named slots. The builder counts the filled template with a pluggable
+tokenizer (a ~4 characters per token estimate, or tiktoken when configured) and, when it is
+over the operation's input budget, shrinks the slots that allow it in the order they are given,
+always from the untouched original text, so the same inputs produce the same prompt. Slots that
+must not be cut (the passage a refinement rewrites) raise `PromptTooLarge` instead.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, NamedTuple, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+ELLIPSIS = "…"
+CHARS_PER_TOKEN = 4
+
+_LEADING_PARTIAL_WORD = re.compile(r"^\S*\s+")
+_TRAILING_PARTIAL_WORD = re.compile(r"\s+\S*$")
+
+
+class PromptTooLarge(ValueError):
+    pass
+
+
+class Tokenizer(ABC):
+    name = ""
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        ...
+
+    @abstractmethod
+    def head(self, text: str, tokens: int) -> str:
+        """The longest prefix of `text` that fits in `tokens`."""
+
+    @abstractmethod
+    def tail(self, text: str, tokens: int) -> str:
+        """The longest suffix of `text` that fits in `tokens`."""
+
+    def truncate(self, text: str, tokens: int, keep: str = "head") -> str:
+        """Cut `text` to about `tokens`, marking the cut; `keep` is head, tail or middle."""
+        if self.count(text) <= tokens:
+            return text
+        if tokens <= 1:
+            return ""
+        if keep == "tail":
+            return ELLIPSIS + " " + self.tail(text, tokens - 1).lstrip()
+        if keep == "middle":
+            half = (tokens - 1) // 2
+            return self.head(text, half).rstrip() + f" {ELLIPSIS} " + self.tail(text, tokens - 1 - half).lstrip()
+        return self.head(text, tokens - 1).rstrip() + " " + ELLIPSIS
+
+
+class EstimateTokenizer(Tokenizer):
+    """Characters / 4, the usual rule of thumb for English with BPE vocabularies; cuts at word boundaries."""
+
+    name = "estimate"
+
+    def count(self, text: str) -> int:
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    def head(self, text: str, tokens: int) -> str:
+        cut = text[: tokens * CHARS_PER_TOKEN]
+        if len(cut) < len(text) and not text[len(cut)].isspace():
+            cut = _TRAILING_PARTIAL_WORD.sub("", cut) or cut
+        return cut
+
+    def tail(self, text: str, tokens: int) -> str:
+        if tokens <= 0:
+            return ""
+        cut = text[-tokens * CHARS_PER_TOKEN :]
+        if len(cut) < len(text) and not text[-len(cut) - 1].isspace():
+            cut = _LEADING_PARTIAL_WORD.sub("", cut, count=1) or cut
+        return cut
+
+
+class TiktokenTokenizer(Tokenizer):
+    def __init__(self, encoding: str) -> None:
+        self.name = f"tiktoken:{encoding}"
+        self.encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def head(self, text: str, tokens: int) -> str:
+        return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:tokens])
+
+    def tail(self, text: str, tokens: int) -> str:
+        return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[-tokens:]) if tokens > 0 else ""
+
+
+def get_tokenizer(name: str) -> Tokenizer:
+    """`estimate`, `tiktoken` (cl100k_base) or `tiktoken:<encoding>`.
+
+    tiktoken is only used when asked for: it downloads the vocabulary on first use, and the
+    tokenizer is built at import time, so an offline host would block startup on the fetch.
+    """
+    if name != "tiktoken" and not name.startswith("tiktoken:"):
+        if name != "estimate":
+            logger.warning("Unknown LLM_TOKENIZER=%s; using the character estimate", name)
+        return EstimateTokenizer()
+    encoding = name.split(":", 1)[1] if ":" in name else "cl100k_base"
+    if tiktoken is None:
+        logger.warning("LLM_TOKENIZER=%s needs tiktoken; using the character estimate", name)
+        return EstimateTokenizer()
+    try:
+        return TiktokenTokenizer(encoding)
+    except Exception as exc:
+        logger.warning("Could not load tiktoken encoding %s (%r); using the character estimate", encoding, exc)
+        return EstimateTokenizer()
+
+
+class TokenBudget(NamedTuple):
+    input: int
+    output: int
+
+
+class Slot(NamedTuple):
+    name: str
+    text: str
+    # head, tail or middle: which part survives truncation; None if the slot must be sent whole.
+    keep: Optional[str] = "head"
+
+
+class Prompt(NamedTuple):
+    text: str
+    tokens: int
+    max_output_tokens: Optional[int] = None
+    truncated: bool = False
+
+
+class PromptBuilder:
+    def __init__(self, tokenizer: Tokenizer, budgets: Dict[str, TokenBudget]) -> None:
+        self.tokenizer = tokenizer
+        self.budgets = budgets
+
+    def count(self, text: str) -> int:
+        return self.tokenizer.count(text)
+
+    def build(self, operation: str, template: str, slots: Sequence[Slot]) -> Prompt:
+        """Fill `template` (str.format placeholders) from `slots`, shrinking slots in order to fit."""
+        budget = self.budgets.get(operation)
+        values = {slot.name: slot.text for slot in slots}
+        tokens = self.count(template.format(**values))
+        if budget is None or tokens <= budget.input:
+            return Prompt(template.format(**values), tokens, budget.output if budget else None)
+
+        for slot in slots:
+            if slot.keep is None or not slot.text:
+                continue
+            target = self.count(slot.text) - (tokens - budget.input)
+            while tokens > budget.input and values[slot.name]:
+                values[slot.name] = self.tokenizer.truncate(slot.text, max(target, 0), slot.keep)
+                tokens = self.count(template.format(**values))
+                target -= max(1, tokens - budget.input)
+            if tokens <= budget.input:
+                break
+        if tokens > budget.input:
+            raise PromptTooLarge(
+                f"The {operation} prompt needs {tokens} tokens but the budget is {budget.input}; "
+                "shorten the text or refine it in smaller parts"
+            )
+        metrics.incr(f"prompt.truncated.{operation}")
+        return Prompt(template.format(**values), tokens, budget.output, truncated=True)
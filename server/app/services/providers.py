@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple, Type
+
+try:
+    import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    genai = None
+    google_exceptions = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from ..config import Settings
+
+
+class ProviderUnavailable(RuntimeError):
+    pass
+
+
+class TransientProviderError(RuntimeError):
+    pass
+
+
+class LLMProvider(ABC):
+    """Backend that turns a prompt into text. Subclasses register themselves by name."""
+
+    name: str = ""
+    retryable: Tuple[Type[BaseException], ...] = ()
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    @abstractmethod
+    async def complete(self, prompt: str, timeout: float, max_tokens: Optional[int] = None) -> str:
+        ...
+
+    async def stream(self, prompt: str, timeout: float, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        yield await self.complete(prompt, timeout, max_tokens)
+
+
+ProviderFactory = Callable[[Settings], LLMProvider]
+PROVIDERS: Dict[str, ProviderFactory] = {}
+
+
+def register_provider(name: str) -> Callable[[ProviderFactory], ProviderFactory]:
+    def decorator(factory: ProviderFactory) -> ProviderFactory:
+        PROVIDERS[name] = factory
+        return factory
+
+    return decorator
+
+
+def get_provider(settings: Settings) -> Optional[LLMProvider]:
+    factory = PROVIDERS.get(settings.llm_provider)
+    if factory is None:
+        raise ValueError(f"Unknown LLM provider '{settings.llm_provider}'. Choose from: {', '.join(sorted(PROVIDERS))}")
+    try:
+        return factory(settings)
+    except ProviderUnavailable:
+        return None
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+    retryable = (
+        (
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.TooManyRequests,
+            google_exceptions.InternalServerError,
+            google_exceptions.GatewayTimeout,
+        )
+        if google_exceptions
+        else ()
+    )
+
+    def __init__(self, model_name: str, api_key: str) -> None:
+        super().__init__(model_name)
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    @staticmethod
+    def _generation_config(max_tokens: Optional[int]) -> Optional[dict]:
+        return {"max_output_tokens": max_tokens} if max_tokens else None
+
+    async def complete(self, prompt: str, timeout: float, max_tokens: Optional[int] = None) -> str:
+        response = await self.model.generate_content_async(
+            prompt, generation_config=self._generation_config(max_tokens), request_options={"timeout": timeout}
+        )
+        return response.text.strip()
+
+    async def stream(self, prompt: str, timeout: float, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(
+            prompt,
+            stream=True,
+            generation_config=self._generation_config(max_tokens),
+            request_options={"timeout": timeout},
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+@register_provider("gemini")
+def _gemini(settings: Settings) -> LLMProvider:
+    if not settings.gemini_api_key or genai is None:
+        raise ProviderUnavailable("Gemini requires GEMINI_API_KEY and google-generativeai")
+    try:
+        return GeminiProvider(settings.llm_model or "gemini-1.5-flash", settings.gemini_api_key)
+    except Exception as exc:
+        raise ProviderUnavailable(str(exc)) from exc
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Chat-completions API as served by OpenAI, vLLM, llama.cpp, Ollama and similar servers."""
+
+    name = "openai"
+    retryable = (TransientProviderError,) + ((httpx.TransportError,) if httpx else ())
+
+    def __init__(self, model_name: str, base_url: str, api_key: Optional[str]) -> None:
+        super().__init__(model_name)
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.http = httpx.AsyncClient(base_url=base_url.rstrip("/"), headers=headers)
+
+    def _payload(self, prompt: str, stream: bool, max_tokens: Optional[int]) -> dict:
+        payload = {"model": self.model_name, "messages": [{"role": "user", "content": prompt}], "stream": stream}
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        return payload
+
+    @staticmethod
+    def _check(response: "httpx.Response") -> None:
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientProviderError(f"Provider returned HTTP {response.status_code}")
+        response.raise_for_status()
+
+    async def complete(self, prompt: str, timeout: float, max_tokens: Optional[int] = None) -> str:
+        response = await self.http.post(
+            "/chat/completions", json=self._payload(prompt, False, max_tokens), timeout=timeout
+        )
+        self._check(response)
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+    async def stream(self, prompt: str, timeout: float, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        async with self.http.stream(
+            "POST", "/chat/completions", json=self._payload(prompt, True, max_tokens), timeout=timeout
+        ) as response:
+            self._check(response)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    return
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+
+@register_provider("openai")
+def _openai(settings: Settings) -> LLMProvider:
+    if httpx is None:
+        raise ProviderUnavailable("The OpenAI-compatible provider requires httpx")
+    return OpenAICompatibleProvider(
+        settings.llm_model or "gpt-4o-mini", settings.openai_base_url, settings.openai_api_key
+    )
+
+
+class StubProvider(LLMProvider):
+    """Deterministic offline backend that mimics model latency for load testing."""
+
+    name = "stub"
+    vocabulary = (
+        "strategy market growth customer data platform risk team quarter revenue insight model "
+        "pipeline roadmap adoption margin channel segment forecast initiative capability partner"
+    ).split()
+
+    def __init__(self, model_name: str, first_token_latency: float, tokens_per_second: float, tokens: int) -> None:
+        super().__init__(model_name)
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+
+    def _words(self, prompt: str, max_tokens: Optional[int]) -> list[str]:
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        return [rng.choice(self.vocabulary) for _ in range(min(self.tokens, max_tokens or self.tokens))]
+
+    async def complete(self, prompt: str, timeout: float, max_tokens: Optional[int] = None) -> str:
+        words = self._words(prompt, max_tokens)
+        await asyncio.sleep(self.first_token_latency + len(words) / self.tokens_per_second)
+        return " ".join(words).capitalize() + "."
+
+    async def stream(self, prompt: str, timeout: float, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_token_latency)
+        words = self._words(prompt, max_tokens)
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            text = word.capitalize() if index == 0 else word
+            yield text + ("." if index == len(words) - 1 else " ")
+
+
+@register_provider("stub")
+def _stub(settings: Settings) -> LLMProvider:
+    if settings.stub_tokens_per_second <= 0:
+        raise ValueError(f"STUB_TOKENS_PER_SECOND must be positive, got {settings.stub_tokens_per_second}")
+    return StubProvider(
+        settings.llm_model or "stub",
+        first_token_latency=settings.stub_latency_ms / 1000,
+        tokens_per_second=settings.stub_tokens_per_second,
+        tokens=settings.stub_tokens,
+    )
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import HTTPException, status
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight requests per key (e.g. client IP); excess requests are rejected with 429."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._active: defaultdict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, key: str) -> Iterator[None]:
+        if self.limit <= 0:
+            yield
+            return
+        with self._lock:
+            if self._active[key] >= self.limit:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many concurrent requests",
+                    headers={"Retry-After": "1"},
+                )
+            self._active[key] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[key] -= 1
+                if not self._active[key]:
+                    del self._active[key]
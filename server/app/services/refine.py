@@ -0,0 +1,159 @@
+"""Plans which part of a section a refinement instruction is about.
+
+Incremental refinement sends the model only the passage an instruction targets plus a short
+extractive summary of the rest, then splices the answer back into the original text. Targets
+are found from explicit references ("second paragraph", "the conclusion", quoted text) and,
+failing that, from keyword overlap. Instructions that read as global, or that would touch most
+of the section anyway, fall back to a full-text plan.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from ..models import RefineMode
+
+
+SENTENCES_PER_CHUNK = 3
+SUMMARY_WORDS = 25
+MAX_PARTIAL_SHARE = 0.6
+
+Span = Tuple[int, int]
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+_ORDINALS = {
+    word: index
+    for index, words in enumerate(
+        [("first", "1st"), ("second", "2nd"), ("third", "3rd"), ("fourth", "4th"), ("fifth", "5th"), ("sixth", "6th")]
+    )
+    for word in words
+}
+_ORDINAL_REFERENCE = re.compile(
+    r"\b(first|second|third|fourth|fifth|sixth|1st|2nd|3rd|4th|5th|6th|last|final)\s+(?:paragraph|para|part)\b"
+)
+_NUMBERED_REFERENCE = re.compile(r"\bparagraphs?\s+(\d+)(?:\s*(?:-|to|and|,)\s*(\d+))?")
+_OPENING = re.compile(r"\b(intro|introduction|opening|beginning)\b")
+_CLOSING = re.compile(r"\b(conclusion|conclude|closing|ending|end of)\b")
+_GLOBAL = re.compile(r"\b(whole|entire|overall|throughout|everywhere|every paragraph|all paragraphs|whole section)\b")
+_QUOTED = re.compile(r"[\"“']([^\"”']{8,})[\"”']")
+_WORD = re.compile(r"[a-z][a-z'-]{3,}")
+_INSTRUCTION_WORDS = {
+    "about", "above", "below", "add", "adding", "also", "change", "clarify", "concise", "detail", "details",
+    "expand", "focus", "improve", "include", "less", "make", "mention", "more", "paragraph", "part", "please",
+    "rephrase", "reword", "rewrite", "section", "sentence", "sentences", "shorten", "shorter", "longer",
+    "simplify", "text", "that", "this", "tone", "with", "should", "would", "could", "there", "their", "them",
+    "into", "from", "than", "then", "they", "what", "when", "where", "which", "while", "your",
+}
+
+
+@dataclass(frozen=True)
+class RefinePlan:
+    text: str
+    start: int
+    end: int
+    before: List[str] = field(default_factory=list)
+    after: List[str] = field(default_factory=list)
+
+    @property
+    def partial(self) -> bool:
+        return self.start > 0 or self.end < len(self.text)
+
+    @property
+    def passage(self) -> str:
+        return self.text[self.start : self.end]
+
+    def splice(self, revised: str) -> str:
+        if not self.partial:
+            return revised.strip()
+        return self.text[: self.start] + revised.strip() + self.text[self.end :]
+
+
+def _spans(text: str, separator: re.Pattern, start: int = 0, end: Optional[int] = None) -> List[Span]:
+    end = len(text) if end is None else end
+    spans: List[Span] = []
+    cursor = start
+    for match in separator.finditer(text, start, end):
+        spans.append((cursor, match.start()))
+        cursor = match.end()
+    spans.append((cursor, end))
+    trimmed = []
+    for left, right in spans:
+        chunk = text[left:right]
+        if chunk.strip():
+            trimmed.append((left + len(chunk) - len(chunk.lstrip()), right - (len(chunk) - len(chunk.rstrip()))))
+    return trimmed
+
+
+def chunk_spans(text: str) -> List[Span]:
+    """Paragraphs, or groups of sentences when the section is a single paragraph."""
+    paragraphs = _spans(text, _PARAGRAPH_BREAK)
+    if len(paragraphs) != 1:
+        return paragraphs
+    sentences = _spans(text, _SENTENCE_BREAK, *paragraphs[0])
+    return [
+        (sentences[index][0], sentences[min(index + SENTENCES_PER_CHUNK, len(sentences)) - 1][1])
+        for index in range(0, len(sentences), SENTENCES_PER_CHUNK)
+    ]
+
+
+def _keywords(text: str) -> set[str]:
+    return {word[:6] for word in _WORD.findall(text.lower()) if word not in _INSTRUCTION_WORDS}
+
+
+def _targets(instruction: str, chunks: List[str]) -> List[int]:
+    lowered = instruction.lower()
+    count = len(chunks)
+    targets: set[int] = set()
+    for match in _ORDINAL_REFERENCE.finditer(lowered):
+        word = match.group(1)
+        targets.add(count - 1 if word in ("last", "final") else _ORDINALS[word])
+    for match in _NUMBERED_REFERENCE.finditer(lowered):
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        targets.update(range(first - 1, last))
+    if _OPENING.search(lowered):
+        targets.add(0)
+    if _CLOSING.search(lowered):
+        targets.add(count - 1)
+    for quoted in _QUOTED.findall(instruction):
+        targets.update(index for index, chunk in enumerate(chunks) if quoted.lower() in chunk.lower())
+    targets = {index for index in targets if 0 <= index < count}
+    if targets:
+        return sorted(targets)
+
+    keywords = _keywords(instruction)
+    if not keywords:
+        return []
+    scores = [len(keywords & _keywords(chunk)) for chunk in chunks]
+    best = max(scores)
+    if best < 2:
+        return []
+    return [index for index, score in enumerate(scores) if score == best]
+
+
+def _summary(text: str, spans: List[Span]) -> List[str]:
+    lines = []
+    for start, end in spans:
+        sentence = _SENTENCE_BREAK.split(text[start:end], maxsplit=1)[0]
+        words = sentence.split()
+        lines.append(" ".join(words[:SUMMARY_WORDS]) + (" ..." if len(words) > SUMMARY_WORDS else ""))
+    return lines
+
+
+def build_refine_plan(text: str, instruction: str, mode: RefineMode = RefineMode.full) -> RefinePlan:
+    full = RefinePlan(text, 0, len(text))
+    if mode != RefineMode.incremental or _GLOBAL.search(instruction.lower()):
+        return full
+    spans = chunk_spans(text)
+    if len(spans) < 2:
+        return full
+    targets = _targets(instruction, [text[start:end] for start, end in spans])
+    if not targets:
+        return full
+    first, last = targets[0], targets[-1]
+    start, end = spans[first][0], spans[last][1]
+    if end - start > MAX_PARTIAL_SHARE * len(text):
+        return full
+    return RefinePlan(text, start, end, _summary(text, spans[:first]), _summary(text, spans[last + 1 :]))
@@ -0,0 +1,87 @@
+"""Document rendering on a dedicated process pool.
+
+python-docx and python-pptx hold the GIL while building and zipping a document, so large
+exports rendered on the request threadpool stall every other request. Workers receive plain
+snapshots rather than ORM instances and write straight to disk so only a byte count comes back.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from ..models import DocType, DocumentSection, Project
+from ..utils.docx_export import build_docx
+from ..utils.office_templates import office_templates
+from ..utils.pptx_export import build_pptx
+
+
+def _render_bytes(
+    project_data: Dict[str, Any], sections_data: List[Dict[str, Any]], format: DocType, template_name: str
+) -> bytes:
+    project = Project(**project_data)
+    sections = [DocumentSection(**data) for data in sections_data]
+    template = office_templates.get(template_name, format)
+    build = build_docx if format == DocType.docx else build_pptx
+    return build(project, sections, template).getvalue()
+
+
+def _render_to_file(
+    project_data: Dict[str, Any], sections_data: List[Dict[str, Any]], format: DocType, template_name: str, path: str
+) -> int:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as handle:
+        handle.write(_render_bytes(project_data, sections_data, format, template_name))
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+
+class DocumentRenderer:
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> Optional[Executor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def render(
+        self, project: Project, sections: List[DocumentSection], format: DocType, template_name: str, path: str
+    ) -> int:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool(),
+            _render_to_file,
+            project.model_dump(),
+            [section.model_dump() for section in sections],
+            format,
+            template_name,
+            path,
+        )
+
+    async def render_bytes(
+        self, project: Project, sections: List[DocumentSection], format: DocType, template_name: str
+    ) -> bytes:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool(),
+            _render_bytes,
+            project.model_dump(),
+            [section.model_dump() for section in sections],
+            format,
+            template_name,
+        )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
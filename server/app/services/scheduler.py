@@ -0,0 +1,357 @@
+"""Admission control for model calls: per-user fair queuing, a global concurrency cap and daily quotas.
+
+Every model invocation takes a slot. When all `LLM_GLOBAL_CONCURRENCY` slots are busy, waiters
+queue per (user, priority) flow and are released in start-time fair queuing order: each request
+is tagged `max(virtual time, flow's last finish)` and advances its flow by `1 / weight`, so
+users share capacity evenly however many requests one of them queues, and interactive work
+(weight `LLM_WEIGHT_INTERACTIVE`) overtakes bulk generation (`LLM_WEIGHT_BULK`) without starving
+it. The caller's user and priority travel in a context variable set with `llm_work`.
+
+Daily request and token quotas come from the user's row (or the settings defaults) and usage is
+kept in `llmusage`, one row per user per UTC day. Every check and increment goes to that row, so
+separate API and worker processes enforce one shared quota.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from ..config import get_settings
+from ..database import engine
+from ..models import LLMUsage, User
+from .metrics import metrics
+from .write_queue import write_queue
+
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class LLMPriority(str, Enum):
+    interactive = "interactive"
+    bulk = "bulk"
+
+
+class QuotaExceeded(RuntimeError):
+    def __init__(self, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+_work: ContextVar[Tuple[Optional[int], LLMPriority]] = ContextVar(
+    "llm_work", default=(None, LLMPriority.interactive)
+)
+
+
+@contextmanager
+def llm_work(user_id: Optional[int], priority: LLMPriority = LLMPriority.interactive) -> Iterator[None]:
+    """Attribute model calls made inside the block to `user_id` at `priority`."""
+    token = _work.set((user_id, priority))
+    try:
+        yield
+    finally:
+        _work.reset(token)
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+def _seconds_to_midnight() -> int:
+    now = datetime.utcnow()
+    return int((datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) - now).total_seconds()) + 1
+
+
+def _ensure_usage_row(session: Session, user_id: int, day: date) -> None:
+    dialect = session.get_bind().dialect.name
+    values = {"user_id": user_id, "day": day, "requests": 0, "tokens": 0, "updated_at": datetime.utcnow()}
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        session.exec(insert(LLMUsage).values(**values).on_conflict_do_nothing(index_elements=["user_id", "day"]))
+        return
+    if session.exec(select(LLMUsage.id).where(LLMUsage.user_id == user_id, LLMUsage.day == day)).first() is None:
+        try:
+            with session.begin_nested():
+                session.add(LLMUsage(**values))
+        except IntegrityError:
+            pass
+
+
+def _usage_row(session: Session, user_id: int, day: date) -> Optional[LLMUsage]:
+    return session.exec(select(LLMUsage).where(LLMUsage.user_id == user_id, LLMUsage.day == day)).first()
+
+
+class QuotaTracker:
+    """Daily quotas counted in `llmusage` itself, so API and worker processes share one count.
+
+    A request is reserved with a conditional increment that only succeeds while the user is under
+    quota, its tokens are charged once the call has produced text, and a reservation that never
+    reached the model is handed back. Callers must not be on an event loop.
+    """
+
+    def __init__(self, request_limit: int, token_limit: int) -> None:
+        self.request_limit = request_limit
+        self.token_limit = token_limit
+
+    def _limits(self, session: Session, user_id: int) -> Tuple[int, int]:
+        user = session.get(User, user_id)
+        request_limit = user.daily_request_quota if user and user.daily_request_quota is not None else self.request_limit
+        token_limit = user.daily_token_quota if user and user.daily_token_quota is not None else self.token_limit
+        return request_limit, token_limit
+
+    def _exceeded(self, row: Optional[LLMUsage], limits: Tuple[int, int], prompt_tokens: int) -> Optional[str]:
+        request_limit, token_limit = limits
+        requests, tokens = (row.requests, row.tokens) if row else (0, 0)
+        if request_limit > 0 and requests >= request_limit:
+            return f"Daily model request quota of {request_limit} reached"
+        if token_limit > 0 and tokens + prompt_tokens > token_limit:
+            return f"Daily token quota of {token_limit} reached ({tokens} used)"
+        return None
+
+    def _raise(self, detail: str) -> None:
+        metrics.incr("llm.quota.exceeded")
+        raise QuotaExceeded(detail + "; it resets at 00:00 UTC", _seconds_to_midnight())
+
+    def check(self, user_id: int, prompt_tokens: int = 0) -> None:
+        """Raise `QuotaExceeded` if a call of `prompt_tokens` would go over quota, without reserving it."""
+        with Session(engine) as session:
+            detail = self._exceeded(
+                _usage_row(session, user_id, _today()), self._limits(session, user_id), prompt_tokens
+            )
+        if detail:
+            self._raise(detail)
+
+    def reserve(self, user_id: int, prompt_tokens: int = 0) -> date:
+        """Count one request against today's quota, or raise `QuotaExceeded`; returns the day charged."""
+        day = _today()
+
+        def apply(session: Session) -> Optional[str]:
+            request_limit, token_limit = limits = self._limits(session, user_id)
+            _ensure_usage_row(session, user_id, day)
+            conditions = [LLMUsage.user_id == user_id, LLMUsage.day == day]
+            if request_limit > 0:
+                conditions.append(LLMUsage.requests < request_limit)
+            if token_limit > 0:
+                conditions.append(LLMUsage.tokens + prompt_tokens <= token_limit)
+            result = session.exec(
+                update(LLMUsage)
+                .where(*conditions)
+                .values(requests=LLMUsage.requests + 1, updated_at=datetime.utcnow())
+            )
+            if result.rowcount:
+                return None
+            return self._exceeded(_usage_row(session, user_id, day), limits, prompt_tokens) or "Daily quota reached"
+
+        detail = write_queue.submit(apply).result()
+        if detail:
+            self._raise(detail)
+        return day
+
+    def release(self, user_id: int, day: date) -> None:
+        """Hand back a reservation whose call never reached the model."""
+        write_queue.submit(
+            _update_usage(user_id, day, requests=LLMUsage.requests - 1, only_if=LLMUsage.requests > 0)
+        ).result()
+
+    def charge(self, user_id: int, day: date, tokens: int) -> None:
+        write_queue.submit(_update_usage(user_id, day, tokens=LLMUsage.tokens + tokens)).result()
+
+    def usage(self, user_id: int) -> Dict[str, object]:
+        day = _today()
+        with Session(engine) as session:
+            row = _usage_row(session, user_id, day)
+            request_limit, token_limit = self._limits(session, user_id)
+        return {
+            "day": day,
+            "requests": row.requests if row else 0,
+            "tokens": row.tokens if row else 0,
+            "request_limit": request_limit,
+            "token_limit": token_limit,
+        }
+
+
+def _update_usage(user_id: int, day: date, only_if: Any = None, **values: Any) -> Callable[[Session], None]:
+    def apply(session: Session) -> None:
+        statement = update(LLMUsage).where(LLMUsage.user_id == user_id, LLMUsage.day == day)
+        if only_if is not None:
+            statement = statement.where(only_if)
+        session.exec(statement.values(updated_at=datetime.utcnow(), **values))
+
+    return apply
+
+
+_usage_writes = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm-usage")
+
+
+def _settle_usage(quotas: QuotaTracker, grant: Grant) -> None:
+    try:
+        if grant.used:
+            quotas.charge(grant.user_id, grant.day, grant.tokens)
+        else:
+            quotas.release(grant.user_id, grant.day)
+    except Exception:
+        logger.warning("Could not record model usage for user %s", grant.user_id, exc_info=True)
+
+
+class _Waiter:
+    __slots__ = ("start", "seq", "priority", "future")
+
+    def __init__(self, start: float, seq: int, priority: LLMPriority) -> None:
+        self.start = start
+        self.seq = seq
+        self.priority = priority
+        self.future: Future = Future()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.start, self.seq) < (other.start, other.seq)
+
+
+class Grant:
+    """Held for the duration of one model call.
+
+    A call that produced text reports its prompt + completion tokens with `record`, and they are
+    charged to the caller's quota on release; otherwise the request reservation is handed back.
+    """
+
+    __slots__ = ("user_id", "day", "tokens", "used")
+
+    def __init__(self, user_id: Optional[int], day: Optional[date]) -> None:
+        self.user_id = user_id
+        self.day = day
+        self.tokens = 0
+        self.used = False
+
+    def record(self, tokens: int) -> None:
+        self.tokens = tokens
+        self.used = True
+
+
+class LLMScheduler:
+    def __init__(self, concurrency: int, weights: Dict[LLMPriority, float], quotas: QuotaTracker) -> None:
+        self.concurrency = max(1, concurrency)
+        self.weights = weights
+        self.quotas = quotas
+        self.active = 0
+        self._virtual = 0.0
+        self._finish: Dict[Tuple[Optional[int], LLMPriority], float] = {}
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _enqueue(self, user_id: Optional[int], priority: LLMPriority) -> _Waiter:
+        flow = (user_id, priority)
+        with self._lock:
+            start = max(self._virtual, self._finish.get(flow, 0.0))
+            self._finish[flow] = start + 1.0 / self.weights[priority]
+            waiter = _Waiter(start, next(self._seq), priority)
+            heapq.heappush(self._queue, waiter)
+            self._dispatch()
+            if not waiter.future.done():
+                metrics.incr(f"llm.scheduler.queued.{priority.value}")
+        return waiter
+
+    def _dispatch(self) -> None:
+        while self._queue and self.active < self.concurrency:
+            waiter = heapq.heappop(self._queue)
+            if not waiter.future.set_running_or_notify_cancel():
+                continue
+            self.active += 1
+            self._virtual = waiter.start
+            waiter.future.set_result(None)
+        if len(self._finish) > 4096:
+            self._finish = {flow: finish for flow, finish in self._finish.items() if finish > self._virtual}
+
+    def _release(self) -> None:
+        with self._lock:
+            self.active -= 1
+            self._dispatch()
+
+    def _admit(self, user_id: Optional[int], prompt_tokens: int) -> Optional[date]:
+        return self.quotas.reserve(user_id, prompt_tokens) if user_id is not None else None
+
+    @contextmanager
+    def slot(self, prompt_tokens: int = 0) -> Iterator[Grant]:
+        user_id, priority = _work.get()
+        grant = Grant(user_id, self._admit(user_id, prompt_tokens))
+        try:
+            self._enqueue(user_id, priority).future.result()
+        except BaseException:
+            if user_id is not None:
+                self.quotas.release(user_id, grant.day)
+            raise
+        try:
+            yield grant
+        finally:
+            self._release()
+            if user_id is not None:
+                _settle_usage(self.quotas, grant)
+
+    @asynccontextmanager
+    async def aslot(self, prompt_tokens: int = 0) -> AsyncIterator[Grant]:
+        user_id, priority = _work.get()
+        admission = asyncio.ensure_future(asyncio.to_thread(self._admit, user_id, prompt_tokens))
+        try:
+            day = await asyncio.shield(admission)
+        except asyncio.CancelledError:
+            # The reservation commits in its thread regardless; hand it back once it has.
+            admission.add_done_callback(lambda done: self._refund(user_id, done))
+            raise
+        grant = Grant(user_id, day)
+        waiter = self._enqueue(user_id, priority)
+        try:
+            await asyncio.wrap_future(waiter.future)
+        except asyncio.CancelledError:
+            # cancel() fails once the slot has been handed over, which leaves it ours to give back.
+            if not waiter.future.cancel():
+                self._release()
+            if user_id is not None:
+                _usage_writes.submit(_settle_usage, self.quotas, grant)
+            raise
+        try:
+            yield grant
+        finally:
+            self._release()
+            # Usage writes can hit the database inline, so they never run on the event loop.
+            if user_id is not None:
+                _usage_writes.submit(_settle_usage, self.quotas, grant)
+
+    def _refund(self, user_id: Optional[int], admission: asyncio.Future) -> None:
+        if user_id is None or admission.cancelled() or admission.exception() is not None:
+            return
+        _usage_writes.submit(_settle_usage, self.quotas, Grant(user_id, admission.result()))
+
+    async def acheck_quota(self, user_id: int) -> None:
+        """Fail fast before queueing work that could not run today."""
+        await asyncio.to_thread(self.quotas.check, user_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            queued = [waiter for waiter in self._queue if not waiter.future.cancelled()]
+            return {
+                "active": self.active,
+                "concurrency": self.concurrency,
+                **{f"queued_{priority.value}": sum(w.priority == priority for w in queued) for priority in LLMPriority},
+            }
+
+
+llm_scheduler = LLMScheduler(
+    settings.llm_global_concurrency,
+    {LLMPriority.interactive: settings.llm_weight_interactive, LLMPriority.bulk: settings.llm_weight_bulk},
+    QuotaTracker(settings.llm_daily_request_quota, settings.llm_daily_token_quota),
+)
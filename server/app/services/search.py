@@ -0,0 +1,183 @@
+"""Full-text search over project titles and topics and section titles and content.
+
+On SQLite the text lives in two FTS5 tables keyed by rowid, `project_fts` and `section_fts`.
+Mapper events rewrite a row in the same transaction whenever an indexed column changes, so the
+index is never behind the data. On PostgreSQL, GIN indexes over `to_tsvector` expressions on
+the tables themselves serve the same queries and need no sync. Other databases have no index,
+and `search` raises `SearchUnavailable` there.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Connection
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..models import DocumentSection, Project
+
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+_WORD = re.compile(r"\w+", re.UNICODE)
+_PG_CONFIG = "english"
+_PG_JOIN = " || ' ' || "
+
+
+def _pg_document(*columns: str) -> str:
+    # Queries must repeat the indexed expression exactly for the planner to use the GIN index.
+    return f"to_tsvector('{_PG_CONFIG}', {_PG_JOIN.join(columns)})"
+
+
+class SearchUnavailable(RuntimeError):
+    pass
+
+
+def create_search_index(connection: Connection) -> None:
+    """Create the search index for the connection's dialect and fill it from existing rows."""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        existing = {
+            name
+            for (name,) in connection.execute(
+                text("SELECT name FROM sqlite_master WHERE name IN ('project_fts', 'section_fts')")
+            )
+        }
+        if "project_fts" not in existing:
+            connection.execute(
+                text("CREATE VIRTUAL TABLE project_fts USING fts5(title, topic, tokenize='porter unicode61')")
+            )
+            connection.execute(
+                text("INSERT INTO project_fts (rowid, title, topic) SELECT id, title, topic FROM project")
+            )
+        if "section_fts" not in existing:
+            connection.execute(
+                text("CREATE VIRTUAL TABLE section_fts USING fts5(title, content, tokenize='porter unicode61')")
+            )
+            connection.execute(
+                text("INSERT INTO section_fts (rowid, title, content) SELECT id, title, content FROM documentsection")
+            )
+    elif dialect == "postgresql":
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_project_search "
+                f"ON project USING GIN ({_pg_document('title', 'topic')})"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_documentsection_search "
+                f"ON documentsection USING GIN ({_pg_document('title', 'content')})"
+            )
+        )
+
+
+def _changed(target: Any, *names: str) -> bool:
+    attrs = inspect(target).attrs
+    return any(attrs[name].history.has_changes() for name in names)
+
+
+def _replace(connection: Connection, table: str, rowid: int, values: Dict[str, str]) -> None:
+    connection.execute(text(f"DELETE FROM {table} WHERE rowid = :rowid"), {"rowid": rowid})
+    columns = ", ".join(values)
+    placeholders = ", ".join(f":{name}" for name in values)
+    connection.execute(
+        text(f"INSERT INTO {table} (rowid, {columns}) VALUES (:rowid, {placeholders})"), {"rowid": rowid, **values}
+    )
+
+
+@event.listens_for(Project, "after_insert")
+@event.listens_for(Project, "after_update")
+def _index_project(_mapper, connection: Connection, target: Project) -> None:
+    if connection.dialect.name == "sqlite" and _changed(target, "title", "topic"):
+        _replace(connection, "project_fts", target.id, {"title": target.title, "topic": target.topic})
+
+
+@event.listens_for(DocumentSection, "after_insert")
+@event.listens_for(DocumentSection, "after_update")
+def _index_section(_mapper, connection: Connection, target: DocumentSection) -> None:
+    if connection.dialect.name == "sqlite" and _changed(target, "title", "content"):
+        _replace(connection, "section_fts", target.id, {"title": target.title, "content": target.content or ""})
+
+
+@event.listens_for(Project, "after_delete")
+def _unindex_project(_mapper, connection: Connection, target: Project) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DELETE FROM project_fts WHERE rowid = :rowid"), {"rowid": target.id})
+
+
+@event.listens_for(DocumentSection, "after_delete")
+def _unindex_section(_mapper, connection: Connection, target: DocumentSection) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DELETE FROM section_fts WHERE rowid = :rowid"), {"rowid": target.id})
+
+
+def fts5_query(query: str) -> str:
+    """Quote each word so user input cannot be read as FTS5 syntax; the last word matches as a prefix."""
+    terms = [f'"{word}"' for word in _WORD.findall(query)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+# Titles weigh more than body text. bm25() is lower-is-better, so it is negated into a score.
+_SQLITE_SEARCH = f"""
+SELECT * FROM (
+    SELECT 'project' AS kind, p.id AS project_id, p.title AS project_title, NULL AS section_id,
+           p.title AS title, snippet(project_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16) AS snippet,
+           -bm25(project_fts, 4.0, 2.0) AS score
+    FROM project_fts JOIN project p ON p.id = project_fts.rowid
+    WHERE project_fts MATCH :match AND p.owner_id = :owner_id
+    UNION ALL
+    SELECT 'section', p.id, p.title, s.id, s.title,
+           snippet(section_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16),
+           -bm25(section_fts, 4.0, 1.0)
+    FROM section_fts JOIN documentsection s ON s.id = section_fts.rowid JOIN project p ON p.id = s.project_id
+    WHERE section_fts MATCH :match AND p.owner_id = :owner_id
+)
+ORDER BY score DESC
+LIMIT :limit
+"""
+
+# Headlines are only built for the rows that make the page.
+_PG_HEADLINE = f"StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxFragments=1, MinWords=8, MaxWords=24"
+_POSTGRES_SEARCH = f"""
+WITH q AS (SELECT websearch_to_tsquery('{_PG_CONFIG}', :query) AS query),
+hits AS (
+    SELECT * FROM (
+        SELECT 'project' AS kind, p.id AS project_id, p.title AS project_title, NULL::integer AS section_id,
+               p.title AS title, p.topic AS body,
+               2 * ts_rank({_pg_document("p.title", "p.topic")}, q.query) AS score
+        FROM project p, q
+        WHERE p.owner_id = :owner_id AND {_pg_document("p.title", "p.topic")} @@ q.query
+        UNION ALL
+        SELECT 'section', p.id, p.title, s.id, s.title, s.content,
+               ts_rank({_pg_document("s.title", "s.content")}, q.query)
+        FROM documentsection s JOIN project p ON p.id = s.project_id, q
+        WHERE p.owner_id = :owner_id AND {_pg_document("s.title", "s.content")} @@ q.query
+    ) matched
+    ORDER BY score DESC
+    LIMIT :limit
+)
+SELECT kind, project_id, project_title, section_id, title,
+       ts_headline('{_PG_CONFIG}', body, q.query, '{_PG_HEADLINE}') AS snippet, score
+FROM hits, q
+ORDER BY score DESC
+"""
+
+
+async def search(session: AsyncSession, owner_id: int, query: str, limit: int) -> List[Dict[str, Any]]:
+    """Ranked hits across the owner's projects and sections, best first."""
+    dialect = session.bind.dialect.name
+    if dialect == "sqlite":
+        match = fts5_query(query)
+        if not match:
+            return []
+        statement, params = text(_SQLITE_SEARCH), {"match": match}
+    elif dialect == "postgresql":
+        statement, params = text(_POSTGRES_SEARCH), {"query": query}
+    else:
+        raise SearchUnavailable(f"Full-text search is not available on {dialect}")
+    result = await session.execute(statement, {**params, "owner_id": owner_id, "limit": limit})
+    return [dict(row._mapping) for row in result]
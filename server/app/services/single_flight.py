@@ -0,0 +1,54 @@
+"""Coalesces concurrent identical requests onto one in-flight call.
+
+The first caller for a key starts the work as its own task; callers that arrive with the same key
+before it finishes await that task and receive the same result (or the same exception). The task
+is shielded, so a caller that disconnects does not cancel the work for the others, and the key is
+released as soon as it settles so later requests run fresh.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from .metrics import metrics
+
+
+T = TypeVar("T")
+
+
+def payload_key(*parts: Any) -> str:
+    """Stable hash of JSON-serialisable request fields."""
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._calls: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+
+    async def run(self, operation: str, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        call_key = (operation, key)
+        task = self._calls.get(call_key)
+        if task is None:
+            metrics.incr(f"single_flight.{operation}.calls")
+            task = asyncio.ensure_future(factory())
+            self._calls[call_key] = task
+            task.add_done_callback(lambda done: self._release(call_key, done))
+        else:
+            metrics.incr(f"single_flight.{operation}.coalesced")
+        return await asyncio.shield(task)
+
+    def _release(self, call_key: Tuple[str, Hashable], task: asyncio.Future) -> None:
+        if self._calls.get(call_key) is task:
+            del self._calls[call_key]
+        if not task.cancelled():
+            # Every waiter may have gone away; mark the outcome as observed either way.
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls)}
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from ..config import get_settings
+from ..database import engine, is_sqlite
+
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+WriteOp = Callable[[Session], T]
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Single writer thread that group-commits small writes.
+
+    Each op mutates the session it is handed; ops that arrive within `max_delay` of each other
+    share one transaction. Callers are only resolved after that transaction commits, so batching
+    never acknowledges a write that is not durable. If a batch fails, its ops are replayed one
+    transaction at a time so a bad write cannot fail its neighbours.
+    """
+
+    def __init__(self, bind: Engine, enabled: bool, max_batch: int, max_delay: float) -> None:
+        self.bind = bind
+        self.enabled = enabled
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.batches = 0
+        self.writes = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def submit(self, op: WriteOp[T]) -> Future:
+        future: Future = Future()
+        if not self.enabled:
+            self._apply_one(op, future)
+            return future
+        self._ensure_started()
+        self._queue.put((op, future))
+        return future
+
+    async def run(self, op: WriteOp[T]) -> T:
+        if not self.enabled:
+            return await asyncio.to_thread(lambda: self.submit(op).result())
+        return await asyncio.wrap_future(self.submit(op))
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch: List[Tuple[WriteOp, Future]] = [item]
+            deadline = time.monotonic() + self.max_delay
+            stopping = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._apply_batch(batch)
+            if stopping:
+                return
+
+    def _apply_batch(self, batch: List[Tuple[WriteOp, Future]]) -> None:
+        if len(batch) == 1:
+            self._apply_one(*batch[0])
+            return
+        try:
+            with Session(self.bind, expire_on_commit=False) as session:
+                results = [op(session) for op, _ in batch]
+                session.commit()
+        except Exception:
+            logger.warning("Write batch of %s failed; replaying individually", len(batch), exc_info=True)
+            for op, future in batch:
+                self._apply_one(op, future)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _apply_one(self, op: WriteOp, future: Future) -> None:
+        try:
+            with Session(self.bind, expire_on_commit=False) as session:
+                result = op(session)
+                session.commit()
+        except Exception as exc:
+            future.set_exception(exc)
+            return
+        self.batches += 1
+        self.writes += 1
+        future.set_result(result)
+
+
+write_queue = WriteQueue(
+    engine,
+    enabled=is_sqlite and settings.write_queue_enabled,
+    max_batch=settings.write_queue_max_batch,
+    max_delay=settings.write_queue_max_delay_ms / 1000,
+)
@@ -1,20 +1,23 @@
 from __future__ import annotations
 
 from io import BytesIO
+from typing import Optional
 
-from docx import Document
+from ..models import DocType, DocumentSection, Project
+from .office_templates import OfficeTemplate, office_templates
 
-from ..models import DocumentSection, Project
 
-
-def build_docx(project: Project, sections: list[DocumentSection]) -> BytesIO:
-    document = Document()
-    document.add_heading(project.title, 0)
+def build_docx(project: Project, sections: list[DocumentSection], template: Optional[OfficeTemplate] = None) -> BytesIO:
+    template = template or office_templates.get(None, DocType.docx)
+    document = template.open()
+    title_style = template.styles.get("title", (None,))[0]
+    heading_style = template.styles.get("heading", (None,))[0]
+    document.add_paragraph(project.title, style=title_style)
     document.add_paragraph(project.topic)
     document.add_page_break()
 
     for section in sorted(sections, key=lambda s: s.position):
-        document.add_heading(section.title, level=1)
+        document.add_paragraph(section.title, style=heading_style)
         document.add_paragraph(section.content or "Content pending.")
         document.add_page_break()
 
@@ -22,4 +25,3 @@ def build_docx(project: Project, sections: list[DocumentSection]) -> BytesIO:
     document.save(buffer)
     buffer.seek(0)
     return buffer
-
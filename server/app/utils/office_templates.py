@@ -0,0 +1,205 @@
+"""Registered .dotx/.potx (or .docx/.pptx) templates, preparsed once and cloned per export.
+
+Template packages declare a `template.main` content type that python-docx and python-pptx refuse
+to open as documents, so it is rewritten on registration. Presentation templates are stripped of
+sample slides. The normalised package bytes, their unzipped parts and the layout/style choices
+the exporters need are kept in memory. Builders get a deep copy of a document parsed once per
+process, so an export neither unzips nor parses XML again.
+"""
+from __future__ import annotations
+
+import copy
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from docx import Document
+from pptx import Presentation
+
+from ..config import get_settings
+from ..models import DocType
+
+
+settings = get_settings()
+
+DEFAULT_TEMPLATE = "default"
+TEMPLATE_SUFFIXES = {
+    ".dotx": DocType.docx,
+    ".docx": DocType.docx,
+    ".potx": DocType.pptx,
+    ".pptx": DocType.pptx,
+}
+_MAIN_CONTENT_TYPES = {
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.template.main+xml": (
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"
+    ),
+    "application/vnd.openxmlformats-officedocument.presentationml.template.main+xml": (
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation.main+xml"
+    ),
+}
+_LAYOUT_NAMES = {"title": ("Title Slide",), "content": ("Title and Content", "Title, Content")}
+_STYLE_NAMES = {"title": "Title", "heading": "Heading 1"}
+
+
+class TemplateNotFound(KeyError):
+    pass
+
+
+class SlideLayout(NamedTuple):
+    index: int
+    part: str
+    title_placeholder: str
+    body_placeholder: Optional[str]
+    body_width: int
+    body_height: int
+
+
+@dataclass(frozen=True, eq=False)
+class OfficeTemplate:
+    name: str
+    doc_type: DocType
+    package: bytes
+    parts: Dict[str, bytes]
+    layouts: Dict[str, SlideLayout] = field(default_factory=dict)
+    # docx: role -> (style name, style id)
+    styles: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    _parsed: Dict[str, Any] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def open(self):
+        """A document to build into, deep-copied from the one parsed on first use."""
+        with self._lock:
+            master = self._parsed.get("master")
+            if master is None:
+                package = BytesIO(self.package)
+                master = Document(package) if self.doc_type == DocType.docx else Presentation(package)
+                self._parsed["master"] = master
+            return copy.deepcopy(master)
+
+
+def _unzip(package: bytes) -> Dict[str, bytes]:
+    with zipfile.ZipFile(BytesIO(package)) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def _zip(parts: Dict[str, bytes]) -> bytes:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in parts.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _normalise(package: bytes) -> bytes:
+    parts = _unzip(package)
+    content_types = parts["[Content_Types].xml"].decode("utf-8")
+    for template_type, document_type in _MAIN_CONTENT_TYPES.items():
+        content_types = content_types.replace(template_type, document_type)
+    parts["[Content_Types].xml"] = content_types.encode("utf-8")
+    return _zip(parts)
+
+
+def _placeholder_xml(placeholder) -> str:
+    ph = placeholder.element.ph
+    attributes = "".join(f' {name}="{ph.get(name)}"' for name in ("type", "idx") if ph.get(name) is not None)
+    return f"<p:ph{attributes}/>"
+
+
+def _prepare_docx(name: str, package: bytes) -> OfficeTemplate:
+    document = Document(BytesIO(package))
+    styles = {}
+    for role, style_name in _STYLE_NAMES.items():
+        try:
+            style = document.styles[style_name]
+        except KeyError:
+            continue
+        styles[role] = (style.name, style.style_id)
+    return OfficeTemplate(name, DocType.docx, package, _unzip(package), styles=styles)
+
+
+def _prepare_pptx(name: str, package: bytes) -> OfficeTemplate:
+    presentation = Presentation(BytesIO(package))
+    slide_ids = presentation.slides._sldIdLst
+    for slide_id in list(slide_ids):
+        presentation.part.drop_rel(slide_id.rId)
+        slide_ids.remove(slide_id)
+    buffer = BytesIO()
+    presentation.save(buffer)
+    package = buffer.getvalue()
+
+    layouts = list(presentation.slide_layouts)
+    chosen = {}
+    for position, role in enumerate(("title", "content")):
+        index = next(
+            (i for i, layout in enumerate(layouts) if layout.name in _LAYOUT_NAMES[role]),
+            min(position, len(layouts) - 1),
+        )
+        layout = layouts[index]
+        title = next((ph for ph in layout.placeholders if ph.placeholder_format.idx == 0), None)
+        body = next((ph for ph in layout.placeholders if ph.placeholder_format.idx != 0), None)
+        chosen[role] = SlideLayout(
+            index=index,
+            part=layout.part.partname.split("/")[-1],
+            title_placeholder=_placeholder_xml(title) if title is not None else '<p:ph type="title"/>',
+            body_placeholder=_placeholder_xml(body) if body is not None else None,
+            body_width=body.width if body is not None else presentation.slide_width,
+            body_height=body.height if body is not None else presentation.slide_height,
+        )
+    return OfficeTemplate(name, DocType.pptx, package, _unzip(package), layouts=chosen)
+
+
+def prepare_template(name: str, doc_type: DocType, package: bytes) -> OfficeTemplate:
+    package = _normalise(package)
+    return _prepare_docx(name, package) if doc_type == DocType.docx else _prepare_pptx(name, package)
+
+
+def _blank_package(doc_type: DocType) -> bytes:
+    buffer = BytesIO()
+    (Document() if doc_type == DocType.docx else Presentation()).save(buffer)
+    return buffer.getvalue()
+
+
+class TemplateRegistry:
+    """Templates by (name, format); `default` is python-docx/python-pptx's blank document."""
+
+    def __init__(self, directory: Optional[str]) -> None:
+        self.directory = Path(directory) if directory else None
+        self._templates: Optional[Dict[Tuple[str, DocType], OfficeTemplate]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[Tuple[str, DocType], OfficeTemplate]:
+        with self._lock:
+            if self._templates is None:
+                templates = {
+                    (DEFAULT_TEMPLATE, doc_type): prepare_template(DEFAULT_TEMPLATE, doc_type, _blank_package(doc_type))
+                    for doc_type in DocType
+                }
+                if self.directory and self.directory.is_dir():
+                    for path in sorted(self.directory.iterdir()):
+                        doc_type = TEMPLATE_SUFFIXES.get(path.suffix.lower())
+                        if doc_type is not None:
+                            templates[(path.stem, doc_type)] = prepare_template(path.stem, doc_type, path.read_bytes())
+                self._templates = templates
+            return self._templates
+
+    def register(self, name: str, doc_type: DocType, package: bytes) -> OfficeTemplate:
+        template = prepare_template(name, doc_type, package)
+        templates = self._load()
+        with self._lock:
+            templates[(name, doc_type)] = template
+        return template
+
+    def get(self, name: Optional[str], doc_type: DocType) -> OfficeTemplate:
+        try:
+            return self._load()[(name or DEFAULT_TEMPLATE, doc_type)]
+        except KeyError:
+            raise TemplateNotFound(f"No {doc_type.value} template named '{name}'") from None
+
+    def available(self) -> List[Tuple[str, DocType]]:
+        return sorted(self._load())
+
+
+office_templates = TemplateRegistry(settings.export_template_dir)
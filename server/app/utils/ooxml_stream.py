@@ -0,0 +1,255 @@
+"""Streaming .docx/.pptx writers.
+
+`build_docx`/`build_pptx` hold the whole python-docx object tree and the finished zip in memory.
+These writers copy the static parts of a registered template (preparsed once per process) and
+emit the document XML section by section into a zip written to an unseekable sink, so peak memory is one
+section plus the compressor window however long the report is.
+"""
+from __future__ import annotations
+
+import re
+import zipfile
+from dataclasses import dataclass
+from functools import lru_cache
+from io import RawIOBase
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from ..models import DocType, DocumentSection, Project
+from ..config import get_settings
+from .office_templates import OfficeTemplate, office_templates
+from .slide_layout import section_slides
+
+
+settings = get_settings()
+
+FLUSH_BYTES = 64 * 1024
+XML_DECLARATION = "<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n"
+SLIDE_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.slide+xml"
+SLIDE_RELATIONSHIP = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide"
+LAYOUT_RELATIONSHIP = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideLayout"
+
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_RELATIONSHIP_ID = re.compile(r'Id="rId(\d+)"')
+_EMPTY_SLIDE_LIST = re.compile(r"<p:sldIdLst\s*/>|<p:sldIdLst>\s*</p:sldIdLst>")
+
+Member = Tuple[str, Iterable[bytes]]
+
+
+class _Sink(RawIOBase):
+    """Write-only, unseekable buffer; zipfile falls back to data descriptors when it cannot seek."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._offset = 0
+        self.pending = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        self.pending += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.pending = 0
+        return data
+
+
+def stream_zip(members: Iterable[Member]) -> Iterator[bytes]:
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, pieces in members:
+            with archive.open(name, "w") as member:
+                for piece in pieces:
+                    member.write(piece)
+                    if sink.pending >= FLUSH_BYTES:
+                        yield sink.drain()
+            if sink.pending >= FLUSH_BYTES:
+                yield sink.drain()
+    yield sink.drain()
+
+
+class ZipStream:
+    """Incremental zip writer for members that are complete in memory; each call returns bytes to send."""
+
+    def __init__(self, compression: int = zipfile.ZIP_STORED) -> None:
+        self._sink = _Sink()
+        self._archive = zipfile.ZipFile(self._sink, "w", compression=compression)
+
+    def add(self, name: str, data: bytes) -> bytes:
+        with self._archive.open(name, "w") as member:
+            member.write(data)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._archive.close()
+        return self._sink.drain()
+
+
+def _text(value: str) -> str:
+    return escape(_INVALID_XML_CHARS.sub("", value))
+
+
+@dataclass(frozen=True)
+class _DocxSkeleton:
+    parts: Dict[str, bytes]
+    head: str
+    tail: str
+    title_style: Optional[str]
+    heading_style: Optional[str]
+
+
+@lru_cache(maxsize=32)
+def _docx_skeleton(template: OfficeTemplate) -> _DocxSkeleton:
+    parts = dict(template.parts)
+    document = parts.pop("word/document.xml").decode("utf-8")
+    body_end = document.rindex("<w:sectPr")
+    return _DocxSkeleton(
+        parts,
+        document[:body_end],
+        document[body_end:],
+        template.styles.get("title", (None, None))[1],
+        template.styles.get("heading", (None, None))[1],
+    )
+
+
+def _docx_paragraph(text: str, style: str | None = None) -> str:
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    runs = "<w:br/>".join(f'<w:t xml:space="preserve">{_text(line)}</w:t>' for line in text.split("\n"))
+    return f"<w:p>{properties}<w:r>{runs}</w:r></w:p>"
+
+
+_DOCX_PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+def _docx_body(skeleton: _DocxSkeleton, project: Project, sections: Iterable[DocumentSection]) -> Iterator[bytes]:
+    yield skeleton.head.encode("utf-8")
+    yield (
+        _docx_paragraph(project.title, skeleton.title_style) + _docx_paragraph(project.topic) + _DOCX_PAGE_BREAK
+    ).encode("utf-8")
+    for section in sections:
+        yield (
+            _docx_paragraph(section.title, skeleton.heading_style)
+            + _docx_paragraph(section.content or "Content pending.")
+            + _DOCX_PAGE_BREAK
+        ).encode("utf-8")
+    yield skeleton.tail.encode("utf-8")
+
+
+def stream_docx(
+    project: Project, sections: Iterable[DocumentSection], template: Optional[OfficeTemplate] = None
+) -> Iterator[bytes]:
+    """Yield a .docx for `sections`, which must already be in position order."""
+    skeleton = _docx_skeleton(template or office_templates.get(None, DocType.docx))
+    members: List[Member] = [(name, (data,)) for name, data in skeleton.parts.items()]
+    members.insert(0, ("word/document.xml", _docx_body(skeleton, project, sections)))
+    return stream_zip(members)
+
+
+def _next_relationship(template: OfficeTemplate) -> int:
+    relationships = template.parts["ppt/_rels/presentation.xml.rels"].decode("utf-8")
+    return max((int(number) for number in _RELATIONSHIP_ID.findall(relationships)), default=0) + 1
+
+
+_SLIDE_HEAD = (
+    XML_DECLARATION + '<p:sld xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><p:cSld><p:spTree>'
+    '<p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr><p:grpSpPr/>'
+)
+_SLIDE_TAIL = "</p:spTree></p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sld>"
+
+
+def _pptx_shape(
+    shape_id: int, name: str, placeholder: Optional[str], paragraphs: List[str], font_pt: Optional[float] = None
+) -> str:
+    if placeholder is None:
+        return ""
+    run_properties = f'<a:rPr lang="en-US" sz="{int(font_pt * 100)}" dirty="0"/>' if font_pt else ""
+    body = "".join(
+        f"<a:p><a:r>{run_properties}<a:t>{_text(text)}</a:t></a:r></a:p>" if text else "<a:p/>" for text in paragraphs
+    )
+    return (
+        f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="{name}"/><p:cNvSpPr><a:spLocks noGrp="1"/></p:cNvSpPr>'
+        f"<p:nvPr>{placeholder}</p:nvPr></p:nvSpPr><p:spPr/>"
+        f"<p:txBody><a:bodyPr/><a:lstStyle/>{body or '<a:p/>'}</p:txBody></p:sp>"
+    )
+
+
+def _slide_rels(layout: str) -> bytes:
+    return (
+        XML_DECLARATION + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'<Relationship Id="rId1" Type="{LAYOUT_RELATIONSHIP}" Target="../slideLayouts/{layout}"/></Relationships>'
+    ).encode("utf-8")
+
+
+def _slide(number: int, layout: str, shapes: str) -> Tuple[Member, Member]:
+    return (
+        (f"ppt/slides/slide{number}.xml", ((_SLIDE_HEAD + shapes + _SLIDE_TAIL).encode("utf-8"),)),
+        (f"ppt/slides/_rels/slide{number}.xml.rels", (_slide_rels(layout),)),
+    )
+
+
+def _pptx_members(
+    template: OfficeTemplate, project: Project, sections: Iterable[DocumentSection]
+) -> Iterator[Member]:
+    parts = dict(template.parts)
+    presentation = parts.pop("ppt/presentation.xml").decode("utf-8")
+    relationships = parts.pop("ppt/_rels/presentation.xml.rels").decode("utf-8")
+    content_types = parts.pop("[Content_Types].xml").decode("utf-8")
+    yield from ((name, (data,)) for name, data in parts.items())
+
+    title_layout = template.layouts["title"]
+    content_layout = template.layouts["content"]
+    count = 1
+    yield from _slide(
+        count,
+        title_layout.part,
+        _pptx_shape(2, "Title 1", title_layout.title_placeholder, [project.title])
+        + _pptx_shape(3, "Subtitle 2", title_layout.body_placeholder, [project.topic]),
+    )
+    for section in sections:
+        for title, bullets in section_slides(section.title, section.content, content_layout):
+            count += 1
+            yield from _slide(
+                count,
+                content_layout.part,
+                _pptx_shape(2, "Title 1", content_layout.title_placeholder, [title])
+                + _pptx_shape(
+                    3, "Content Placeholder 2", content_layout.body_placeholder, bullets, settings.pptx_body_font_pt
+                ),
+            )
+
+    first_rid = _next_relationship(template)
+    slide_ids = "".join(f'<p:sldId id="{256 + index}" r:id="rId{first_rid + index}"/>' for index in range(count))
+    presentation = _EMPTY_SLIDE_LIST.sub("", presentation).replace(
+        "</p:sldMasterIdLst>", f"</p:sldMasterIdLst><p:sldIdLst>{slide_ids}</p:sldIdLst>", 1
+    )
+    slide_relationships = "".join(
+        f'<Relationship Id="rId{first_rid + index}" Type="{SLIDE_RELATIONSHIP}" Target="slides/slide{index + 1}.xml"/>'
+        for index in range(count)
+    )
+    overrides = "".join(
+        f'<Override PartName="/ppt/slides/slide{index + 1}.xml" ContentType="{SLIDE_CONTENT_TYPE}"/>'
+        for index in range(count)
+    )
+    relationships = relationships.replace("</Relationships>", slide_relationships + "</Relationships>")
+    content_types = content_types.replace("</Types>", overrides + "</Types>")
+    yield "ppt/presentation.xml", (presentation.encode("utf-8"),)
+    yield "ppt/_rels/presentation.xml.rels", (relationships.encode("utf-8"),)
+    yield "[Content_Types].xml", (content_types.encode("utf-8"),)
+
+
+def stream_pptx(
+    project: Project, sections: Iterable[DocumentSection], template: Optional[OfficeTemplate] = None
+) -> Iterator[bytes]:
+    """Yield a .pptx for `sections`; package parts that list slides are written last."""
+    return stream_zip(_pptx_members(template or office_templates.get(None, DocType.pptx), project, sections))
@@ -1,36 +1,52 @@
 from __future__ import annotations
 
 from io import BytesIO
+from typing import Optional
 
-from pptx import Presentation
+from pptx.util import Pt
 
-from ..models import DocumentSection, Project
+from ..config import get_settings
+from ..models import DocType, DocumentSection, Project
+from .office_templates import OfficeTemplate, office_templates
+from .slide_layout import section_slides
 
 
-def build_pptx(project: Project, sections: list[DocumentSection]) -> BytesIO:
-    presentation = Presentation()
-    title_slide_layout = presentation.slide_layouts[0]
-    title_slide = presentation.slides.add_slide(title_slide_layout)
+settings = get_settings()
+
+
+def _body_placeholder(slide):
+    return next((shape for shape in slide.placeholders if shape.placeholder_format.idx != 0), None)
+
+
+def build_pptx(project: Project, sections: list[DocumentSection], template: Optional[OfficeTemplate] = None) -> BytesIO:
+    template = template or office_templates.get(None, DocType.pptx)
+    presentation = template.open()
+    title_layout = presentation.slide_layouts[template.layouts["title"].index]
+    content_layout = template.layouts["content"]
+    bullet_layout = presentation.slide_layouts[content_layout.index]
+
+    title_slide = presentation.slides.add_slide(title_layout)
     title_slide.shapes.title.text = project.title
-    subtitle = title_slide.placeholders[1]
-    subtitle.text = project.topic
+    subtitle = _body_placeholder(title_slide)
+    if subtitle is not None:
+        subtitle.text = project.topic
 
-    bullet_layout = presentation.slide_layouts[1]
     for section in sorted(sections, key=lambda s: s.position):
-        slide = presentation.slides.add_slide(bullet_layout)
-        slide.shapes.title.text = section.title
-        body = slide.shapes.placeholders[1].text_frame
-        body.clear()
-        body.text = ""
-        for line in section.content.split("\n"):
-            if line.strip():
-                if not body.text:
-                    body.text = line.strip()
-                else:
-                    body.add_paragraph().text = line.strip()
+        for title, bullets in section_slides(section.title, section.content, content_layout):
+            slide = presentation.slides.add_slide(bullet_layout)
+            slide.shapes.title.text = title
+            placeholder = _body_placeholder(slide)
+            if placeholder is None:
+                continue
+            body = placeholder.text_frame
+            body.clear()
+            for index, bullet in enumerate(bullets):
+                paragraph = body.paragraphs[0] if index == 0 else body.add_paragraph()
+                run = paragraph.add_run()
+                run.text = bullet
+                run.font.size = Pt(settings.pptx_body_font_pt)
 
     buffer = BytesIO()
     presentation.save(buffer)
     buffer.seek(0)
     return buffer
-
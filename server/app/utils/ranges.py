@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from starlette.responses import Response
+
+
+CHUNK_SIZE = 64 * 1024
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive byte span of a single-range header, or None to serve the whole file."""
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start:
+        first, last = int(start), min(int(end), size - 1) if end else size - 1
+    else:
+        first, last = max(size - int(end), 0), size - 1
+    if first >= size or first > last:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return first, last
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an `If-None-Match` header names `etag` (weakly or strongly) or `*`."""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _read_span(handle: BinaryIO, first: int, last: int) -> Iterator[bytes]:
+    with handle:
+        handle.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(path: str, media_type: str, range_header: Optional[str], headers: dict[str, str]) -> Response:
+    """Serve `path` whole or as a single byte range, or 410 if the file is gone.
+
+    The file is opened up front and streamed from that handle, so removing it mid-request does not fail.
+    """
+    try:
+        handle = open(path, "rb")
+    except OSError:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="File is no longer available") from None
+    size = os.fstat(handle.fileno()).st_size
+    try:
+        span = parse_range(range_header, size)
+    except HTTPException:
+        handle.close()
+        raise
+    headers = {**headers, "Accept-Ranges": "bytes"}
+    if span is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_read_span(handle, 0, size - 1), media_type=media_type, headers=headers)
+    first, last = span
+    headers.update({"Content-Range": f"bytes {first}-{last}/{size}", "Content-Length": str(last - first + 1)})
+    return StreamingResponse(
+        _read_span(handle, first, last),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers,
+    )
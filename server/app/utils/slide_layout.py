@@ -0,0 +1,156 @@
+"""Paginates section text into bullet slides that fit the body placeholder.
+
+Widths come from a per-character table of average proportional-font advances (in ems), cached
+per character and per word, which is close enough to Calibri/Arial to decide line breaks without
+loading font files. Whole layouts are memoised on (content hash, text box) because the same
+section is usually exported many times between edits.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+from ..config import get_settings
+from .office_templates import SlideLayout
+
+
+settings = get_settings()
+
+EMU_PER_POINT = 12700
+INSET_X = 91440 * 2
+INSET_Y = 45720 * 2
+BULLET_INDENT = 342900
+LINE_SPACING = 1.2
+SPACE_BEFORE = 0.2
+
+_NARROW = set("ijl.,;:'!|`ft()[]{}/\\\"-")
+_WIDE = set("mwMW@%")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+_BULLET_PREFIX = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+
+class TextBox(NamedTuple):
+    width: int
+    height: int
+    font_pt: float
+
+
+Page = List[str]
+
+
+@lru_cache(maxsize=512)
+def _char_em(char: str) -> float:
+    if char == " ":
+        return 0.23
+    if char in _NARROW:
+        return 0.28
+    if char in _WIDE:
+        return 0.85
+    if char.isupper():
+        return 0.62
+    if char.isdigit():
+        return 0.51
+    return 0.5
+
+
+@lru_cache(maxsize=65536)
+def _word_em(word: str) -> float:
+    return sum(_char_em(char) for char in word)
+
+
+def wrap(text: str, width_pt: float, font_pt: float) -> List[str]:
+    limit = width_pt / font_pt
+    space = _char_em(" ")
+    lines: List[str] = []
+    current: List[str] = []
+    used = 0.0
+    for word in text.split():
+        advance = _word_em(word)
+        if current and used + space + advance > limit:
+            lines.append(" ".join(current))
+            current, used = [], 0.0
+        used += advance + (space if current else 0.0)
+        current.append(word)
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+def split_bullets(content: str) -> List[str]:
+    bullets: List[str] = []
+    for line in content.split("\n"):
+        line = _BULLET_PREFIX.sub("", line).strip()
+        if line:
+            bullets.extend(sentence.strip() for sentence in _SENTENCE_END.split(line) if sentence.strip())
+    return bullets
+
+
+class SlideTextLayout:
+    def __init__(self, cache_size: int) -> None:
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[tuple, List[Page]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def paginate(self, content: str, box: TextBox) -> List[Page]:
+        key = (hashlib.sha256(content.encode("utf-8")).hexdigest(), box)
+        with self._lock:
+            pages = self._cache.get(key)
+            if pages is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return pages
+            self.misses += 1
+        pages = self._layout(content, box)
+        with self._lock:
+            self._cache[key] = pages
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return pages
+
+    def _layout(self, content: str, box: TextBox) -> List[Page]:
+        width_pt = (box.width - INSET_X - BULLET_INDENT) / EMU_PER_POINT
+        height_pt = (box.height - INSET_Y) / EMU_PER_POINT
+        line_pt = box.font_pt * LINE_SPACING
+        gap_pt = box.font_pt * SPACE_BEFORE
+        lines_per_slide = max(1, int((height_pt - gap_pt) // line_pt))
+
+        pages: List[Page] = []
+        page: Page = []
+        used = 0.0
+        for bullet in split_bullets(content):
+            lines = wrap(bullet, width_pt, box.font_pt)
+            # A bullet taller than a slide is cut at line boundaries into slide-sized pieces.
+            pieces = [
+                " ".join(lines[start : start + lines_per_slide]) for start in range(0, len(lines), lines_per_slide)
+            ]
+            for piece in pieces:
+                height = gap_pt + line_pt * min(len(lines), lines_per_slide)
+                if page and used + height > height_pt:
+                    pages.append(page)
+                    page, used = [], 0.0
+                page.append(piece)
+                used += height
+                lines = lines[lines_per_slide:]
+        if page or not pages:
+            pages.append(page)
+        return pages
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+
+slide_text_layout = SlideTextLayout(settings.pptx_layout_cache_size)
+
+
+def section_slides(title: str, content: str, layout: SlideLayout) -> List[Tuple[str, Page]]:
+    """(slide title, bullets) for each slide a section needs; continuation slides are marked."""
+    box = TextBox(layout.body_width, layout.body_height, settings.pptx_body_font_pt)
+    pages = slide_text_layout.paginate(content or "", box)
+    return [(title if index == 0 else f"{title} (cont.)", page) for index, page in enumerate(pages)]
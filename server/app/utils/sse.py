@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+import json
+from typing import Any, AsyncIterator, Iterator, Union
+
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events: Union[Iterator[str], AsyncIterator[str]]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
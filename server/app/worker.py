@@ -0,0 +1,27 @@
+"""Standalone generation worker: `python -m app.worker`.
+
+Run with `JOB_WORKERS=0` on the API processes so only dedicated workers drain the queue.
+"""
+import logging
+import signal
+import threading
+
+from .config import get_settings
+from .database import init_db
+from .services.jobs import JobWorker
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    worker = JobWorker(get_settings().worker_threads)
+    stopped = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    worker.start()
+    stopped.wait()
+    worker.stop()
+
+
+if __name__ == "__main__":
+    main()
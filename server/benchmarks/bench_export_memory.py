@@ -0,0 +1,70 @@
+"""Peak Python heap of the python-docx/python-pptx builders versus the streaming OOXML writers.
+
+Run from `server/`: `python -m benchmarks.bench_export_memory [--sections 200 1000 5000] [--words 400]`
+
+The builders need every section up front and return the finished file in a BytesIO. The
+streaming writers are fed a generator, as the route does, and their output is discarded chunk
+by chunk the way a socket would consume it. tracemalloc only sees Python allocations, so the
+lxml trees behind the builders are not counted and their figures are a lower bound.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Iterator
+
+from app.models import DocType, DocumentSection, Project
+from app.utils.docx_export import build_docx
+from app.utils.office_templates import office_templates
+from app.utils.ooxml_stream import stream_docx, stream_pptx
+from app.utils.pptx_export import build_pptx
+
+
+WORDS = "market growth customer platform revenue insight roadmap adoption margin forecast".split()
+
+
+def make_sections(count: int, words: int) -> Iterator[DocumentSection]:
+    for index in range(count):
+        lines = [
+            " ".join(WORDS[(index + line + offset) % len(WORDS)] for offset in range(40)) for line in range(words // 40)
+        ]
+        yield DocumentSection(
+            id=index + 1, project_id=1, title=f"Section {index + 1}", position=index, content="\n".join(lines)
+        )
+
+
+def measure(run: Callable[[], int]) -> tuple[float, float, int]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = run()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, elapsed, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--words", type=int, default=400)
+    args = parser.parse_args()
+
+    for format in DocType:
+        office_templates.get(None, format)
+    print(f"{args.words} words per section; peak traced heap in MiB")
+    print(f"{'format':>7}{'sections':>10}{'builder MiB':>13}{'stream MiB':>12}{'builder s':>11}{'stream s':>10}")
+    for format in (DocType.docx, DocType.pptx):
+        project = Project(id=1, owner_id=1, title="Benchmark", topic="Export memory", doc_type=format)
+        build, stream = (build_docx, stream_docx) if format == DocType.docx else (build_pptx, stream_pptx)
+        for count in args.sections:
+            builder = measure(lambda: len(build(project, list(make_sections(count, args.words))).getbuffer()))
+            streamed = measure(lambda: sum(len(chunk) for chunk in stream(project, make_sections(count, args.words))))
+            print(
+                f"{format.value:>7}{count:>10}{builder[0]:>13.1f}{streamed[0]:>12.1f}"
+                f"{builder[1]:>11.2f}{streamed[1]:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Query timings for the hot lookups with no secondary indexes and after the migrations add them.
+
+Run from `server/`: `python -m benchmarks.bench_indexes [--projects 2000] [--sections 12] [--revisions 4]`
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, text
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.migrations import run_migrations
+from app.models import DocType, DocumentSection, Project, Revision, User
+
+
+MEASURED_TABLES = (Project.__table__, DocumentSection.__table__, Revision.__table__)
+
+
+def drop_secondary_indexes(engine) -> None:
+    """Leave only primary keys on the measured tables, so later indexes cannot serve the "before" run."""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in MEASURED_TABLES:
+            for index in inspector.get_indexes(table.name):
+                connection.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+
+
+def populate(engine, projects: int, sections: int, revisions: int, users: int) -> None:
+    rng = random.Random(7)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(
+            User.__table__.insert(),
+            [
+                {"id": i + 1, "email": f"user{i}@example.com", "full_name": "Bench", "hashed_password": "x",
+                 "created_at": start}
+                for i in range(users)
+            ],
+        )
+        connection.execute(
+            Project.__table__.insert(),
+            [
+                {
+                    "id": p + 1,
+                    "owner_id": rng.randint(1, users),
+                    "title": f"Project {p}",
+                    "topic": "benchmark",
+                    "doc_type": DocType.docx.name,
+                    "status": "ready",
+                    "created_at": start + timedelta(minutes=p),
+                    "updated_at": start + timedelta(minutes=p),
+                }
+                for p in range(projects)
+            ],
+        )
+        order = list(range(projects * sections))
+        rng.shuffle(order)
+        connection.execute(
+            DocumentSection.__table__.insert(),
+            [
+                {
+                    "id": n + 1,
+                    "project_id": n // sections + 1,
+                    "title": f"Section {n % sections}",
+                    "position": n % sections,
+                    "content": "lorem ipsum " * 20,
+                    "created_at": start,
+                    "updated_at": start,
+                }
+                for n in order
+            ],
+        )
+        connection.execute(
+            Revision.__table__.insert(),
+            [
+                {"section_id": rng.randint(1, projects * sections), "prompt": "p", "response": "r",
+                 "created_at": start + timedelta(seconds=r)}
+                for r in range(projects * sections * revisions)
+            ],
+        )
+
+
+def time_queries(engine, projects: int, sections: int, users: int, samples: int) -> dict[str, float]:
+    rng = random.Random(11)
+    queries = {
+        "sections by project ordered by position": lambda session: session.exec(
+            select(DocumentSection)
+            .where(DocumentSection.project_id == rng.randint(1, projects))
+            .order_by(DocumentSection.position)
+        ).all(),
+        "revisions by section ordered by created_at": lambda session: session.exec(
+            select(Revision)
+            .where(Revision.section_id == rng.randint(1, projects * sections))
+            .order_by(Revision.created_at)
+        ).all(),
+        "projects by owner ordered by created_at": lambda session: session.exec(
+            select(Project).where(Project.owner_id == rng.randint(1, users)).order_by(Project.created_at)
+        ).all(),
+    }
+    timings = {}
+    with Session(engine) as session:
+        for name, query in queries.items():
+            query(session)
+            started = time.perf_counter()
+            for _ in range(samples):
+                query(session)
+            timings[name] = (time.perf_counter() - started) / samples * 1000
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--sections", type=int, default=12)
+    parser.add_argument("--revisions", type=int, default=4)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        drop_secondary_indexes(engine)
+        populate(engine, args.projects, args.sections, args.revisions, args.users)
+
+        before = time_queries(engine, args.projects, args.sections, args.users, args.samples)
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    "CREATE TABLE schema_version ("
+                    "version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TIMESTAMP NOT NULL)"
+                )
+            )
+            connection.execute(text("INSERT INTO schema_version VALUES (1, 'baseline schema', CURRENT_TIMESTAMP)"))
+        version = run_migrations(engine)
+        with engine.connect() as connection:
+            connection.execute(text("ANALYZE"))
+        after = time_queries(engine, args.projects, args.sections, args.users, args.samples)
+
+    rows = args.projects * args.sections
+    print(f"{args.projects} projects, {rows} sections, {rows * args.revisions} revisions; schema v{version}")
+    print(f"{'query':<46}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in before:
+        print(f"{name:<46}{before[name]:>12.3f}{after[name]:>12.3f}{before[name] / after[name]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
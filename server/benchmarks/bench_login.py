@@ -0,0 +1,46 @@
+"""Password verifications (the CPU cost of a login) per second at each hashing pool size.
+
+Run from `server/`: `python -m benchmarks.bench_login [--rounds 12] [--logins 64] [--pools 0 1 2 4]`
+
+Pool size 0 verifies on the event loop's default threadpool, which is how the routes behaved
+before hashing moved to a process pool.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from app.services.passwords import PasswordHasher, build_context
+
+
+async def measure(workers: int, rounds: int, logins: int, hashed: str) -> float:
+    hasher = PasswordHasher(workers, rounds)
+    try:
+        await hasher.verify_and_update("correct horse", hashed)
+        started = time.perf_counter()
+        results = await asyncio.gather(*[hasher.verify_and_update("correct horse", hashed) for _ in range(logins)])
+        elapsed = time.perf_counter() - started
+    finally:
+        hasher.shutdown()
+    assert all(verified for verified, _ in results)
+    return logins / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--pools", type=int, nargs="+", default=[0, 1, 2, 4, 8])
+    args = parser.parse_args()
+
+    hashed = build_context(args.rounds).hash("correct horse")
+    print(f"bcrypt rounds={args.rounds}, {args.logins} concurrent logins")
+    print(f"{'pool size':>10}{'logins/s':>12}")
+    for workers in args.pools:
+        rate = asyncio.run(measure(workers, args.rounds, args.logins, hashed))
+        print(f"{workers if workers else 'thread':>10}{rate:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Prompt size of full versus incremental refinement after several rounds of growth.
+
+Run from `server/`: `python -m benchmarks.bench_refine_prompt [--paragraphs 3 6 12] [--words 90]`
+
+Tokens are counted with the configured tokenizer (LLM_TOKENIZER). Instructions mix explicit references
+("the third paragraph"), keyword-targeted edits and a global rewrite that falls back to full.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+
+from app.models import RefineMode
+from app.services.llm import llm_service
+
+
+VOCABULARY = (
+    "tidal wave offshore turbine grid storage financing policy subsidy supply chain port vessel "
+    "maintenance forecast demand coastal community permit cable substation yield efficiency"
+).split()
+INSTRUCTIONS = [
+    "Make the third paragraph more concise",
+    "Expand the conclusion with a call to action",
+    "Add figures on storage and grid",
+    "Rewrite the opening to be punchier",
+    "Improve the tone of the whole section",
+]
+
+
+def make_section(paragraphs: int, words: int) -> str:
+    return "\n\n".join(
+        ". ".join(
+            " ".join(VOCABULARY[(paragraph * 7 + sentence * 3 + word) % len(VOCABULARY)] for word in range(15)).capitalize()
+            for sentence in range(words // 15)
+        )
+        + "."
+        for paragraph in range(paragraphs)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[3, 6, 12])
+    parser.add_argument("--words", type=int, default=90)
+    args = parser.parse_args()
+
+    print(f"{'paragraphs':>10}{'full tokens':>13}{'incremental':>13}{'saving':>9}")
+    for paragraphs in args.paragraphs:
+        text = make_section(paragraphs, args.words)
+        sizes = {mode: [] for mode in RefineMode}
+        for instruction in INSTRUCTIONS:
+            for mode in RefineMode:
+                plan = llm_service.plan_refinement(text, instruction, mode)
+                sizes[mode].append(llm_service.refine_prompt("Ocean energy", "Outlook", plan, instruction).tokens)
+        full = statistics.mean(sizes[RefineMode.full])
+        incremental = statistics.mean(sizes[RefineMode.incremental])
+        print(f"{paragraphs:>10}{full:>13.0f}{incremental:>13.0f}{1 - incremental / full:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
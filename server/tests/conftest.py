@@ -0,0 +1,56 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Settings are read at import, so the test database and stub provider must be configured first.
+_directory = tempfile.mkdtemp(prefix="ocean-ai-tests-")
+atexit.register(shutil.rmtree, _directory, ignore_errors=True)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_directory, 'test.db')}")
+os.environ.setdefault("LLM_PROVIDER", "stub")
+os.environ.setdefault("EXPORT_CACHE_DIR", os.path.join(_directory, "export_cache"))
+os.environ.setdefault("EXPORT_ARTIFACT_DIR", os.path.join(_directory, "exports"))
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("EXPORT_WORKERS", "0")
+
+import itertools
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.auth import create_access_token
+from app.database import engine, init_db
+from app.models import User
+
+
+_emails = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def database():
+    init_db()
+    return engine
+
+
+@pytest.fixture
+def user(database) -> User:
+    with Session(database) as session:
+        user = User(email=f"user{next(_emails)}@example.com", full_name="Test", hashed_password="x")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        return user
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def auth_headers(user) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
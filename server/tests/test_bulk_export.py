@@ -0,0 +1,62 @@
+import zipfile
+from io import BytesIO
+
+from docx import Document
+from pptx import Presentation
+from sqlmodel import Session
+
+from app.models import DocType, DocumentSection, Project, User
+
+
+def _project(database, user, title):
+    with Session(database) as session:
+        project = Project(owner_id=user.id, title=title, topic="Bulk export", doc_type=DocType.docx)
+        session.add(project)
+        session.flush()
+        for position in range(2):
+            session.add(
+                DocumentSection(
+                    project_id=project.id, title=f"Part {position}", position=position, content="Tidal power. " * 10
+                )
+            )
+        session.commit()
+        return project.id
+
+
+def test_bulk_export_zips_every_project_in_every_format(client, database, user, auth_headers):
+    project_ids = [_project(database, user, "Tides"), _project(database, user, "Waves")]
+    response = client.post(
+        "/export/bulk", json={"project_ids": project_ids, "formats": ["docx", "pptx"]}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+    with zipfile.ZipFile(BytesIO(response.content)) as archive:
+        assert archive.testzip() is None
+        names = sorted(archive.namelist())
+        assert names == sorted(
+            f"{project_id}-{title}.{format}"
+            for project_id, title in zip(project_ids, ("Tides", "Waves"))
+            for format in ("docx", "pptx")
+        )
+        for name in names:
+            data = BytesIO(archive.read(name))
+            if name.endswith(".docx"):
+                assert any(paragraph.text == "Part 1" for paragraph in Document(data).paragraphs)
+            else:
+                assert len(Presentation(data).slides) >= 3
+
+
+def test_bulk_export_rejects_projects_the_caller_does_not_own(client, database, user, auth_headers):
+    with Session(database) as session:
+        other = User(email=f"other-{user.id}@example.com", full_name="Other", hashed_password="x")
+        session.add(other)
+        session.commit()
+        session.refresh(other)
+    foreign = _project(database, other, "Theirs")
+    mine = _project(database, user, "Mine")
+    response = client.post(
+        "/export/bulk", json={"project_ids": [mine, foreign], "formats": ["docx"]}, headers=auth_headers
+    )
+    assert response.status_code == 404
+    assert str(foreign) in response.json()["detail"]
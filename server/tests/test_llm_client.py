@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+from app.services.llm_client import BreakerState, CircuitBreaker, LLMClient
+
+
+def _client(complete_fn=None, stream_fn=None, max_retries=0):
+    async def complete(prompt, timeout, max_tokens):
+        return "ok"
+
+    breaker = CircuitBreaker(window=4, failure_rate=0.5, min_calls=1, reset_after=0.01)
+    client = LLMClient(
+        complete_fn or complete,
+        stream_fn,
+        timeout=5,
+        deadline=10,
+        max_retries=max_retries,
+        retry_base_delay=0,
+        retry_max_delay=0,
+        hedge_after=0,
+        breaker=breaker,
+    )
+    return client, breaker
+
+
+def _trip(breaker):
+    breaker.record_failure()
+    assert breaker.state == BreakerState.open
+    time.sleep(0.02)
+
+
+def test_closed_stream_releases_half_open_probe():
+    async def stream(prompt, timeout, max_tokens):
+        yield "one"
+        # Still streaming when the consumer goes away.
+        await asyncio.sleep(60)
+        yield "two"
+
+    client, breaker = _client(stream_fn=stream)
+    _trip(breaker)
+
+    async def take_one():
+        chunks = client.astream("prompt")
+        assert await chunks.__anext__() == "one"
+        await chunks.aclose()
+
+    asyncio.run(take_one())
+    time.sleep(0.05)
+    assert breaker.state == BreakerState.half_open
+    assert breaker.allow()
+
+
+def test_cancelled_probe_releases_slot():
+    async def hang(prompt, timeout, max_tokens):
+        await asyncio.sleep(60)
+
+    client, breaker = _client(complete_fn=hang)
+    _trip(breaker)
+    future = client.submit("prompt")
+    time.sleep(0.05)
+    future.cancel()
+    time.sleep(0.05)
+    assert breaker.state == BreakerState.half_open
+    assert breaker.allow()
+
+
+def test_probe_retries_without_reopening():
+    calls = []
+
+    async def flaky(prompt, timeout, max_tokens):
+        calls.append(prompt)
+        if len(calls) == 1:
+            raise ConnectionError("reset")
+        return "recovered"
+
+    client, breaker = _client(complete_fn=flaky, max_retries=2)
+    _trip(breaker)
+    assert client.complete("prompt") == "recovered"
+    assert len(calls) == 2
+    assert breaker.state == BreakerState.closed
+
+
+def _collect(client):
+    async def collect():
+        received = []
+        try:
+            async for chunk in client.astream("prompt"):
+                received.append(chunk)
+        except asyncio.TimeoutError:
+            return received, True
+        return received, False
+
+    return asyncio.run(collect())
+
+
+def test_stream_stalled_mid_way_times_out():
+    async def stall(prompt, timeout, max_tokens):
+        yield "one"
+        await asyncio.sleep(60)
+        yield "never"
+
+    client, breaker = _client(stream_fn=stall)
+    client.timeout = 0.05
+    started = time.monotonic()
+    assert _collect(client) == (["one"], True)
+    assert time.monotonic() - started < 1
+
+
+def test_stream_gives_up_at_the_deadline():
+    async def trickle(prompt, timeout, max_tokens):
+        while True:
+            await asyncio.sleep(0.02)
+            yield "word "
+
+    client, breaker = _client(stream_fn=trickle)
+    client.timeout, client.deadline = 0.1, 0.15
+    started = time.monotonic()
+    received, timed_out = _collect(client)
+    assert timed_out and 0 < len(received) < 10
+    assert time.monotonic() - started < 1
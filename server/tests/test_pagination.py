@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from app.models import DocType, Project
+
+START = datetime(2024, 1, 1)
+
+
+def _add_projects(database, user, offsets, prefix):
+    with Session(database) as session:
+        for number, minutes in enumerate(offsets):
+            created = START + timedelta(minutes=minutes)
+            session.add(
+                Project(
+                    owner_id=user.id,
+                    title=f"{prefix}{number}",
+                    topic="paging",
+                    doc_type=DocType.docx,
+                    created_at=created,
+                    updated_at=created,
+                )
+            )
+        session.commit()
+
+
+def _page(client, headers, cursor=None, limit=3):
+    params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+    response = client.get("/projects/", params=params, headers=headers)
+    assert response.status_code == 200
+    return [project["title"] for project in response.json()], response.headers.get("x-next-cursor")
+
+
+def test_cursor_pages_stay_stable_across_inserts(client, database, user, auth_headers):
+    # Two projects share a timestamp, so the id tiebreak is exercised at a page boundary.
+    _add_projects(database, user, [0, 1, 2, 2, 3, 4, 5], "p")
+    first, cursor = _page(client, auth_headers)
+    assert first == ["p0", "p1", "p2"]
+
+    # Rows inserted behind the cursor must not shift later pages; rows ahead of it show up in order.
+    _add_projects(database, user, [0, 1], "early")
+    _add_projects(database, user, [10], "late")
+
+    seen = list(first)
+    while cursor:
+        titles, cursor = _page(client, auth_headers, cursor)
+        seen.extend(titles)
+    assert seen == ["p0", "p1", "p2", "p3", "p4", "p5", "p6", "late0"]
+
+
+def test_last_page_has_no_cursor(client, database, user, auth_headers):
+    _add_projects(database, user, [0, 1, 2], "p")
+    titles, cursor = _page(client, auth_headers, limit=3)
+    assert titles == ["p0", "p1", "p2"]
+    assert cursor is None
+
+
+def test_malformed_cursor_is_rejected(client, auth_headers):
+    response = client.get("/projects/", params={"cursor": "not-a-cursor"}, headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,56 @@
+from app.models import RefineMode
+from app.services.refine import build_refine_plan, chunk_spans
+
+PARAGRAPHS = [
+    "Offshore wind capacity grew quickly last year as auctions cleared at record volumes.",
+    "Tidal stream turbines remain costly, but array deployments are bringing unit prices down.",
+    "Wave energy converters are still mostly at demonstration scale in European test sites.",
+    "In conclusion, ocean energy can complement solar and onshore wind within a decade.",
+]
+TEXT = "\n\n".join(PARAGRAPHS)
+
+
+def _plan(instruction, text=TEXT):
+    return build_refine_plan(text, instruction, RefineMode.incremental)
+
+
+def test_ordinal_reference_targets_that_paragraph():
+    plan = _plan("Make the second paragraph more concise")
+    assert plan.partial
+    assert plan.passage == PARAGRAPHS[1]
+    assert plan.before == [PARAGRAPHS[0]]
+    assert plan.after == [PARAGRAPHS[2], PARAGRAPHS[3]]
+
+
+def test_numbered_range_and_closing_references():
+    assert _plan("Rewrite paragraphs 2 to 3").passage == "\n\n".join(PARAGRAPHS[1:3])
+    assert _plan("Strengthen the conclusion").passage == PARAGRAPHS[3]
+
+
+def test_keyword_overlap_picks_the_matching_paragraph():
+    assert _plan("Add figures about tidal stream turbines and array costs").passage == PARAGRAPHS[1]
+
+
+def test_splice_replaces_only_the_passage():
+    plan = _plan("Shorten the third paragraph")
+    revised = plan.splice("  Wave devices are still in trials.  ")
+    assert revised == "\n\n".join(PARAGRAPHS[:2] + ["Wave devices are still in trials."] + PARAGRAPHS[3:])
+
+
+def test_global_unmatched_or_large_targets_fall_back_to_full_text():
+    for instruction in ("Improve the tone throughout", "Make it punchier", "Rewrite paragraphs 1 to 4"):
+        plan = _plan(instruction)
+        assert not plan.partial, instruction
+        assert plan.splice(" New text. ") == "New text."
+    assert not build_refine_plan(TEXT, "Make the second paragraph more concise", RefineMode.full).partial
+
+
+def test_single_paragraph_is_chunked_by_sentences():
+    text = " ".join(f"Sentence {n} ends here." for n in range(1, 8))
+    spans = chunk_spans(text)
+    assert [text[start:end] for start, end in spans] == [
+        "Sentence 1 ends here. Sentence 2 ends here. Sentence 3 ends here.",
+        "Sentence 4 ends here. Sentence 5 ends here. Sentence 6 ends here.",
+        "Sentence 7 ends here.",
+    ]
+    assert _plan("Rework the last part", text).passage == "Sentence 7 ends here."
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.scheduler import LLMPriority, LLMScheduler, QuotaExceeded, QuotaTracker, llm_work
+
+
+def _scheduler(quotas, concurrency=1):
+    return LLMScheduler(concurrency, {LLMPriority.interactive: 4, LLMPriority.bulk: 1}, quotas)
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def test_reserve_stops_at_the_request_limit(user):
+    quotas = QuotaTracker(request_limit=2, token_limit=0)
+    day = quotas.reserve(user.id)
+    quotas.reserve(user.id)
+    with pytest.raises(QuotaExceeded):
+        quotas.reserve(user.id)
+    quotas.release(user.id, day)
+    quotas.reserve(user.id)
+    assert quotas.usage(user.id)["requests"] == 2
+
+
+def test_token_limit_counts_the_prompt(user):
+    quotas = QuotaTracker(request_limit=0, token_limit=100)
+    day = quotas.reserve(user.id, prompt_tokens=60)
+    quotas.charge(user.id, day, 90)
+    with pytest.raises(QuotaExceeded):
+        quotas.check(user.id, prompt_tokens=20)
+    assert quotas.usage(user.id)["tokens"] == 90
+
+
+def test_slot_charges_recorded_calls_and_refunds_the_rest(user):
+    quotas = QuotaTracker(request_limit=10, token_limit=0)
+    scheduler = _scheduler(quotas)
+
+    async def calls():
+        with llm_work(user.id):
+            async with scheduler.aslot() as grant:
+                grant.record(42)
+            async with scheduler.aslot():
+                pass
+
+    asyncio.run(calls())
+    _wait_for(lambda: quotas.usage(user.id)["requests"] == 1)
+    assert quotas.usage(user.id)["tokens"] == 42
+    assert scheduler.active == 0
+
+
+def test_cancelled_admission_hands_back_the_reservation(user):
+    class SlowQuotas(QuotaTracker):
+        def reserve(self, user_id, prompt_tokens=0):
+            time.sleep(0.1)
+            return super().reserve(user_id, prompt_tokens)
+
+    quotas = SlowQuotas(request_limit=10, token_limit=0)
+    scheduler = _scheduler(quotas)
+
+    async def cancel_during_admission():
+        async def call():
+            with llm_work(user.id):
+                async with scheduler.aslot():
+                    pytest.fail("a cancelled call must not get a slot")
+
+        task = asyncio.create_task(call())
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.2)
+
+    asyncio.run(cancel_during_admission())
+    _wait_for(lambda: quotas.usage(user.id)["requests"] == 0)
+    assert scheduler.active == 0
+
+
+def test_cancelled_waiter_hands_back_the_reservation(user):
+    quotas = QuotaTracker(request_limit=10, token_limit=0)
+    scheduler = _scheduler(quotas)
+
+    async def cancel_while_queued():
+        release = asyncio.Event()
+
+        async def holder():
+            with llm_work(user.id):
+                async with scheduler.aslot() as grant:
+                    grant.record(1)
+                    await release.wait()
+
+        async def waiter():
+            with llm_work(user.id):
+                async with scheduler.aslot():
+                    pytest.fail("a cancelled waiter must not get a slot")
+
+        holding = asyncio.create_task(holder())
+        await asyncio.sleep(0.1)
+        queued = asyncio.create_task(waiter())
+        await asyncio.sleep(0.1)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        release.set()
+        await holding
+
+    asyncio.run(cancel_while_queued())
+    _wait_for(lambda: quotas.usage(user.id)["requests"] == 1)
+    assert scheduler.active == 0
@@ -0,0 +1,72 @@
+from sqlmodel import Session, select
+
+from app.models import DocType, DocumentSection, Project
+
+
+def _create(database, user, sections=3):
+    with Session(database) as session:
+        project = Project(owner_id=user.id, title="Tides", topic="Ocean energy", doc_type=DocType.docx)
+        session.add(project)
+        session.flush()
+        for position in range(sections):
+            session.add(DocumentSection(project_id=project.id, title=f"Part {position}", position=position))
+        session.commit()
+        return project.id
+
+
+def _versions(database, project_id):
+    with Session(database) as session:
+        project = session.get(Project, project_id)
+        sections = session.exec(
+            select(DocumentSection).where(DocumentSection.project_id == project_id).order_by(DocumentSection.position)
+        ).all()
+        return project.version, [section.version for section in sections]
+
+
+def test_new_sections_are_stamped_with_the_project_version(database, user):
+    project_id = _create(database, user)
+    version, sections = _versions(database, project_id)
+    assert version == 1
+    assert sections == [version] * 3
+
+
+def test_section_edit_bumps_only_that_section(database, user):
+    project_id = _create(database, user)
+    before, _ = _versions(database, project_id)
+    with Session(database) as session:
+        section = session.exec(select(DocumentSection).where(DocumentSection.project_id == project_id)).first()
+        section.content = "Revised"
+        session.add(section)
+        session.commit()
+        edited = section.id
+    version, sections = _versions(database, project_id)
+    assert version == before + 1
+    with Session(database) as session:
+        changed = session.exec(
+            select(DocumentSection.id).where(DocumentSection.project_id == project_id, DocumentSection.version > before)
+        ).all()
+    assert changed == [edited]
+    assert sorted(sections) == [before, before, version]
+
+
+def test_project_edit_bumps_the_project_but_not_its_sections(database, user):
+    project_id = _create(database, user)
+    before, sections_before = _versions(database, project_id)
+    with Session(database) as session:
+        project = session.get(Project, project_id)
+        project.title = "Tidal streams"
+        session.add(project)
+        session.commit()
+        assert project.version == before + 1
+    assert _versions(database, project_id) == (before + 1, sections_before)
+
+
+def test_unchanged_flush_keeps_the_version(database, user):
+    project_id = _create(database, user)
+    before = _versions(database, project_id)
+    with Session(database) as session:
+        section = session.exec(select(DocumentSection).where(DocumentSection.project_id == project_id)).first()
+        section.title = section.title
+        session.add(section)
+        session.commit()
+    assert _versions(database, project_id) == before
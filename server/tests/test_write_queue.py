@@ -0,0 +1,65 @@
+import asyncio
+import itertools
+
+import pytest
+from sqlmodel import Session, select
+
+from app.models import User
+from app.services.write_queue import WriteQueue
+
+_names = itertools.count()
+
+
+def _insert_user():
+    email = f"writer{next(_names)}@example.com"
+
+    def apply(session: Session) -> str:
+        session.add(User(email=email, full_name="Writer", hashed_password="x"))
+        return email
+
+    return apply
+
+
+def _fail(session: Session) -> None:
+    raise ValueError("bad write")
+
+
+def _stored(database, emails):
+    with Session(database) as session:
+        return set(session.exec(select(User.email).where(User.email.in_(emails))).all())
+
+
+@pytest.fixture
+def writes(database):
+    queue = WriteQueue(database, enabled=True, max_batch=16, max_delay=0.05)
+    yield queue
+    queue.stop(timeout=5)
+
+
+def test_concurrent_writes_share_a_transaction(database, writes):
+    futures = [writes.submit(_insert_user()) for _ in range(8)]
+    emails = [future.result(timeout=5) for future in futures]
+    assert writes.writes == 8
+    assert writes.batches < 8
+    assert _stored(database, emails) == set(emails)
+
+
+def test_failed_write_does_not_fail_its_batch(database, writes):
+    futures = [writes.submit(_insert_user()), writes.submit(_fail), writes.submit(_insert_user())]
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    emails = [futures[0].result(timeout=5), futures[2].result(timeout=5)]
+    assert _stored(database, emails) == set(emails)
+
+
+def test_disabled_queue_writes_inline(database):
+    queue = WriteQueue(database, enabled=False, max_batch=16, max_delay=0.05)
+    future = queue.submit(_insert_user())
+    assert future.done()
+    assert _stored(database, [future.result()]) == {future.result()}
+    assert queue._thread is None
+
+
+def test_run_resolves_after_commit(database, writes):
+    email = asyncio.run(writes.run(_insert_user()))
+    assert _stored(database, [email]) == {email}